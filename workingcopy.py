@@ -18,6 +18,14 @@ import glob
 import shutil
 import tempfile
 import re
+import hashlib
+import heapq
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from concurrent.futures import CancelledError, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+from multiprocessing import shared_memory
 
 _BUFFERED_LOGS = []
 _APP_INSTANCE = None
@@ -42,12 +50,193 @@ def app_log(message, level="info"):
 
 try:
     import pytesseract
-    OCR_AVAILABLE = True
+    PYTESSERACT_AVAILABLE = True
 except ImportError:
-    OCR_AVAILABLE = False
-    app_log("Warning: pytesseract not installed. OCR antibot detection will not work.", "warning")
+    PYTESSERACT_AVAILABLE = False
+
+try:
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+OCR_AVAILABLE = PYTESSERACT_AVAILABLE or TESSEROCR_AVAILABLE
+if not OCR_AVAILABLE:
+    app_log("Warning: neither tesserocr nor pytesseract installed. OCR antibot detection will not work.", "warning")
+
+try:
+    import mss
+    MSS_AVAILABLE = True
+except ImportError:
+    MSS_AVAILABLE = False
+    app_log("mss not installed - falling back to scrot for screen capture.", "warning")
+
+try:
+    from Xlib import X, XK
+    from Xlib import display as xdisplay
+    from Xlib.ext import xtest
+    XLIB_AVAILABLE = True
+except ImportError:
+    XLIB_AVAILABLE = False
 
 send_lock = threading.Lock()
+
+DEFAULT_ANTIBOT_PHRASES = [
+    "are you a real human",
+    "please use the link below",
+    "please complete this within 10 minutes",
+    "owobot.com/captcha",
+    "please complete your captcha to verify",
+]
+
+PhraseMatch = namedtuple('PhraseMatch', ['phrase', 'start', 'end', 'distance'])
+
+class AntibotPhraseMatcher:
+    def __init__(self, phrases, max_edit_ratio=0.1, max_edits=3):
+        self.phrases = []
+        for phrase in phrases:
+            phrase = re.sub(r'\s+', ' ', str(phrase).lower().strip())
+            if phrase and phrase not in self.phrases:
+                self.phrases.append(phrase)
+        self.max_edit_ratio = max_edit_ratio
+        self.max_edits = max_edits
+        alternatives = []
+        for index, phrase in enumerate(self.phrases):
+            body = r'\s*'.join(re.escape(word) for word in phrase.split(' '))
+            if phrase[0].isalnum():
+                body = r'\b' + body
+            if phrase[-1].isalnum():
+                body = body + r'\b'
+            alternatives.append(f"(?P<p{index}>{body})")
+        self.pattern = re.compile("|".join(alternatives)) if alternatives else None
+        # Per-phrase character masks for Myers' bit-parallel edit distance
+        self.masks = []
+        self.word_index = []
+        self.word_budget = []
+        for phrase in self.phrases:
+            masks = {}
+            for i, char in enumerate(phrase):
+                masks[char] = masks.get(char, 0) | (1 << i)
+            self.masks.append(masks)
+            words = []
+            word = 0
+            for char in phrase:
+                if char == ' ':
+                    word += 1
+                    words.append(None)
+                else:
+                    words.append(word)
+            self.word_index.append(words)
+            # Long tokens such as the captcha URL may take a second slip
+            self.word_budget.append([max(1, len(token) // 8) for token in phrase.split(' ')])
+
+    @staticmethod
+    def normalize(text):
+        return re.sub(r'\s+', ' ', text.lower().strip())
+
+    def allowed_edits(self, phrase):
+        return min(self.max_edits, int(len(phrase) * self.max_edit_ratio))
+
+    def fuzzy_search(self, index, text):
+        phrase = self.phrases[index]
+        m = len(phrase)
+        limit = self.allowed_edits(phrase)
+        if limit <= 0:
+            return None
+        masks = self.masks[index]
+        full = (1 << m) - 1
+        high = 1 << (m - 1)
+        pv, mv, score = full, 0, m
+        candidates = []
+        for pos, char in enumerate(text):
+            eq = masks.get(char, 0)
+            xv = eq | mv
+            xh = (((eq & pv) + pv) ^ pv) | eq
+            ph = mv | (~(xh | pv) & full)
+            mh = pv & xh
+            if ph & high:
+                score += 1
+            elif mh & high:
+                score -= 1
+            ph = (ph << 1) & full
+            mh = (mh << 1) & full
+            pv = mh | (~(xv | ph) & full)
+            mv = ph & xv
+            if score <= limit:
+                candidates.append((score, pos + 1))
+                if score == 0:
+                    break
+        for distance, end in sorted(candidates):
+            start, edits = self.align(index, text, end, limit)
+            if self.edits_allowed(index, edits):
+                return PhraseMatch(phrase, start, end, distance)
+        return None
+
+    def align(self, index, text, end, limit):
+        # Myers only yields end positions; a small DP on the reversed strings recovers
+        # the real start and which phrase characters were edited
+        phrase = self.phrases[index][::-1]
+        m = len(phrase)
+        window = text[max(0, end - m - limit):end][::-1]
+        n = len(window)
+        dist = [[0] * (n + 1) for _ in range(m + 1)]
+        for j in range(n + 1):
+            dist[0][j] = j
+        for i in range(1, m + 1):
+            dist[i][0] = i
+            for j in range(1, n + 1):
+                dist[i][j] = min(dist[i - 1][j - 1] + (phrase[i - 1] != window[j - 1]),
+                                 dist[i - 1][j] + 1, dist[i][j - 1] + 1)
+        j = min(range(n + 1), key=lambda col: (dist[m][col], col))
+        start = end - j
+        edits = []
+        i = m
+        while i > 0 or j > 0:
+            if i > 0 and j > 0 and dist[i][j] == dist[i - 1][j - 1] + (phrase[i - 1] != window[j - 1]):
+                if phrase[i - 1] != window[j - 1]:
+                    edits.append(m - i)
+                i, j = i - 1, j - 1
+            elif i > 0 and dist[i][j] == dist[i - 1][j] + 1:
+                edits.append(m - i)
+                i -= 1
+            else:
+                # An inserted text character is charged to the phrase character next to it
+                edits.append(min(m - 1, max(0, m - 1 - i)))
+                j -= 1
+        return start, edits
+
+    def edits_allowed(self, index, edits):
+        phrase = self.phrases[index]
+        words = self.word_index[index]
+        per_word = {}
+        for pos in edits:
+            # "within 30 minutes" is not "within 10 minutes": numbers must be exact
+            if phrase[pos].isdigit():
+                return False
+            word = words[pos]
+            if word is not None:
+                per_word[word] = per_word.get(word, 0) + 1
+                # One OCR slip per word; more means a different word ("man" vs "human")
+                if per_word[word] > self.word_budget[index][word]:
+                    return False
+        return True
+
+    def search(self, text, fuzzy=True):
+        text = self.normalize(text)
+        if self.pattern is not None:
+            match = self.pattern.search(text)
+            if match:
+                index = int(match.lastgroup[1:])
+                return PhraseMatch(self.phrases[index], match.start(), match.end(), 0)
+        if not fuzzy:
+            return None
+        for index in range(len(self.phrases)):
+            match = self.fuzzy_search(index, text)
+            if match is not None:
+                return match
+        return None
+
+ANTIBOT_MATCHER = AntibotPhraseMatcher(DEFAULT_ANTIBOT_PHRASES)
 COLORS = {
     'bg': "#0a0e27",
     'surface': '#1a1f3a',
@@ -184,76 +373,2076 @@ class ModernButton(tk.Canvas):
         self.enabled = enabled
         self.draw_button()
 
+class XTestInputBackend:
+    name = "xtest"
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.display = None
+        self.keys = {}
+        self.shift = None
+
+    def connect(self):
+        if self.display is None:
+            # One connection for the whole session instead of an xdotool exec per key
+            self.display = xdisplay.Display()
+            self.shift = self.display.keysym_to_keycode(XK.XK_Shift_L)
+            self.keys = {}
+        return self.display
+
+    def lookup(self, keysym):
+        key = self.keys.get(keysym)
+        if key is None:
+            display = self.connect()
+            keycode = display.keysym_to_keycode(keysym)
+            if not keycode:
+                raise ValueError(f"no keycode for keysym {keysym:#x}")
+            shifted = display.keycode_to_keysym(keycode, 0) != keysym
+            key = self.keys[keysym] = (keycode, shifted)
+        return key
+
+    def tap(self, keysym):
+        with self.lock:
+            try:
+                display = self.connect()
+                keycode, shifted = self.lookup(keysym)
+                if shifted:
+                    xtest.fake_input(display, X.KeyPress, self.shift)
+                xtest.fake_input(display, X.KeyPress, keycode)
+                xtest.fake_input(display, X.KeyRelease, keycode)
+                if shifted:
+                    xtest.fake_input(display, X.KeyRelease, self.shift)
+                # Round-trip so the key has landed before the caller's typing delay starts
+                display.sync()
+            except ValueError:
+                raise
+            except Exception:
+                self.close()
+                raise
+
+    def type_char(self, char):
+        code = ord(char)
+        # Latin-1 keysyms equal their code points; everything else uses the Unicode range
+        self.tap(code if code < 0x100 else 0x01000000 | code)
+
+    def press_enter(self):
+        self.tap(XK.XK_Return)
+
+    def close(self):
+        display, self.display = self.display, None
+        if display is not None:
+            try:
+                display.close()
+            except Exception:
+                pass
+
+class XdotoolInputBackend:
+    name = "xdotool"
+
+    def type_char(self, char):
+        subprocess.run(['xdotool', 'type', '--', char], check=True)
+
+    def type_text(self, text):
+        subprocess.run(['xdotool', 'type', '--', text], check=True)
+
+    def press_enter(self):
+        subprocess.run(['xdotool', 'key', 'Return'], check=True)
+
+    def close(self):
+        pass
+
+class PyautoguiInputBackend:
+    name = "pyautogui"
+
+    def type_char(self, char):
+        pyautogui.write(char)
+
+    def type_text(self, text):
+        pyautogui.write(text)
+
+    def press_enter(self):
+        pyautogui.press('enter')
+
+    def close(self):
+        pass
+
+class InputInjector:
+    def __init__(self):
+        self.backends = []
+        if platform.system() == 'Linux':
+            if XLIB_AVAILABLE and os.environ.get('DISPLAY'):
+                self.backends.append(XTestInputBackend())
+            self.backends.append(XdotoolInputBackend())
+        self.backends.append(PyautoguiInputBackend())
+        self.lock = threading.Lock()
+        self.stats = {}
+        for backend in self.backends:
+            self.stats[backend.name] = {'keys': 0, 'failures': 0, 'total_time': 0.0}
+
+    def send(self, action, payload, keys):
+        for backend in self.backends:
+            start = time.perf_counter()
+            try:
+                if payload is None:
+                    getattr(backend, action)()
+                else:
+                    getattr(backend, action)(payload)
+            except Exception as e:
+                with self.lock:
+                    self.stats[backend.name]['failures'] += 1
+                app_log(f"{backend.name} input failed: {e}", "warning")
+                continue
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                stats = self.stats[backend.name]
+                stats['keys'] += keys
+                stats['total_time'] += elapsed
+            return backend.name
+        raise RuntimeError("no input backend could deliver the keystroke")
+
+    def type_char(self, char):
+        return self.send('type_char', char, 1)
+
+    def type_text(self, text):
+        if self.backends and self.backends[0].name == "xtest":
+            # Key by key, so a character xtest cannot map falls back on its own
+            # instead of the next backend retyping the prefix already sent
+            for char in text:
+                self.type_char(char)
+                # Matches xdotool type's default 12ms inter-key delay
+                time.sleep(0.012)
+            return "xtest"
+        return self.send('type_text', text, max(1, len(text)))
+
+    def press_enter(self):
+        return self.send('press_enter', None, 1)
+
+    def close(self):
+        for backend in self.backends:
+            backend.close()
+
+    def summary(self):
+        parts = []
+        with self.lock:
+            for backend in self.backends:
+                stats = self.stats[backend.name]
+                if not stats['keys'] and not stats['failures']:
+                    continue
+                avg = (stats['total_time'] / stats['keys'] * 1000) if stats['keys'] else 0.0
+                parts.append(f"{backend.name}: {stats['keys']} keys, {avg:.2f}ms/key, {stats['failures']} failures")
+        return "; ".join(parts) if parts else "no keystrokes"
+
+class ConfigSnapshot:
+    __slots__ = ('owobuy_cooldown', 'owo_cooldown', 'owoh_owob_cooldown', 'owobuy_enabled', 'owo_enabled',
+                 'use_slash_hunt_battle', 'random_enabled', 'command_variance', 'typing_delay_min',
+                 'typing_delay_max', 'typing_pause_min', 'typing_pause_max', 'window_name')
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ConfigSnapshot is read-only; publish a new one instead")
+
+CommandJob = namedtuple('CommandJob', ['name', 'steps', 'cooldown', 'enabled'])
+
 class CommandScheduler:
     def __init__(self):
         self.lock = threading.Lock()
-        self.last_command_time = 0
+        self.last_command_time = float('-inf')
         self.min_gap = 0.8
         self.gui = None
+        self.due = []
+        self.due_seq = 0
+        self.generation = 0
+        self.lateness = {}
+        self.input = InputInjector()
+
+    def plan(self, jobs):
+        now = time.monotonic()
+        with self.lock:
+            self.due = []
+            self.generation += 1
+            # Same deadline for all; the sequence number keeps table order on ties
+            for self.due_seq, job in enumerate(jobs):
+                heapq.heappush(self.due, (now, self.due_seq, job, 0))
+            return self.generation
+
+    def schedule(self, job, step, delay, generation=None):
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                # A stopped dispatcher finishing its last send; the new plan owns the heap
+                return
+            self.due_seq += 1
+            heapq.heappush(self.due, (time.monotonic() + delay, self.due_seq, job, step))
 
-    def can_send(self):
+    def next_due(self):
         with self.lock:
-            current_time = time.time()
-            time_since_last = current_time - self.last_command_time
-            can_send = time_since_last >= self.min_gap
-            if can_send:
-                self.last_command_time = current_time
-            return can_send
+            return self.due[0][0] if self.due else None
+
+    def pop_due(self):
+        with self.lock:
+            now = time.monotonic()
+            if self.due and self.due[0][0] <= now:
+                due, _, job, step = heapq.heappop(self.due)
+                # How long the job sat past its deadline behind other jobs' sends
+                stats = self.lateness.setdefault(job.name, [0, 0.0, 0.0])
+                stats[0] += 1
+                stats[1] += now - due
+                stats[2] = max(stats[2], now - due)
+                return job, step
+            return None
 
-    def wait_for_slot(self, timeout=30):
-        start_time = time.time()
-        while not self.can_send():
-            if time.time() - start_time > timeout:
+    def wait_for_slot(self, timeout=30, stop_event=None):
+        if stop_event is None and self.gui is not None:
+            stop_event = self.gui.stop_event
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                ready_at = self.last_command_time + self.min_gap
+                if now >= ready_at:
+                    self.last_command_time = now
+                    return True
+            if ready_at > deadline:
                 return False
-            time.sleep(0.1)
-        return True
+            # Sleep exactly until the gap has elapsed; a stop cuts the wait short
+            if stop_event is None:
+                time.sleep(ready_at - now)
+            elif stop_event.wait(ready_at - now):
+                return False
+
+    def lateness_summary(self):
+        with self.lock:
+            parts = [f"{name}: {count} runs, avg late {total / count * 1000:.0f}ms, max {worst * 1000:.0f}ms"
+                     for name, (count, total, worst) in self.lateness.items() if count]
+        return "; ".join(parts) if parts else "no runs"
 
     def humanize_delay(self, base_delay):
-        if not self.gui or not self.gui.random_enabled.get():
+        config = self.gui.config_snapshot if self.gui else None
+        if config is None or not config.random_enabled:
             return base_delay
-        variance = self.gui.command_variance.get()
+        variance = config.command_variance
         min_delay = base_delay * (1 - variance)
         max_delay = base_delay * (1 + variance)
         return random.uniform(min_delay, max_delay)
 
     def humanize_typing(self, text):
-        if not self.gui or not self.gui.random_enabled.get():
+        config = self.gui.config_snapshot if self.gui else None
+        if config is None or not config.random_enabled:
             try:
-                if platform.system() == 'Linux':
-                    subprocess.run(['xdotool', 'type', '--', text], check=True)
-                else:
-                    pyautogui.write(text)
-                time.sleep(0.3)
+                self.input.type_text(text)
             except Exception as e:
                 app_log(f"Typing error: {e}", "warning")
-                pyautogui.write(text)
-                time.sleep(0.3)
+            time.sleep(0.3)
             return
         try:
-            if platform.system() == 'Linux':
-                for char in text:
-                    delay = random.uniform(
-                        self.gui.typing_delay_min.get(),
-                        self.gui.typing_delay_max.get()
-                    )
-                    subprocess.run(['xdotool', 'type', '--', char], check=True)
-                    time.sleep(delay)
-            else:
-                for char in text:
-                    delay = random.uniform(
-                        self.gui.typing_delay_min.get(),
-                        self.gui.typing_delay_max.get()
-                    )
-                    pyautogui.write(char, interval=delay)
+            for char in text:
+                delay = random.uniform(config.typing_delay_min, config.typing_delay_max)
+                self.input.type_char(char)
+                time.sleep(delay)
         except Exception as e:
             app_log(f"Humanized typing error: {e}", "error")
-            pyautogui.write(text)
-        pause = random.uniform(
-            self.gui.typing_pause_min.get(),
-            self.gui.typing_pause_max.get()
-        )
+        pause = random.uniform(config.typing_pause_min, config.typing_pause_max)
         time.sleep(pause)
 
+class ScrotCaptureBackend:
+    name = "scrot"
+
+    def __init__(self, screenshot_dir):
+        self.screenshot_dir = screenshot_dir
+
+    def grab(self, region=None):
+        prefix = f"temp_screenshot_{int(time.time())}"
+        base_path = os.path.join(self.screenshot_dir, prefix + ".png")
+        pattern = os.path.join(self.screenshot_dir, prefix + "*.png")
+
+        subprocess.run(
+            ["scrot", base_path],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=2,
+        )
+
+        matches = glob.glob(pattern)
+        if not matches:
+            return None
+        latest = max(matches, key=os.path.getmtime)
+
+        img = Image.open(latest)
+        if region is not None:
+            x, y, w, h = region
+            img_copy = img.crop((x, y, x + w, y + h))
+        else:
+            img_copy = img.copy()
+        img.close()
+
+        # Cleanup — race-safe
+        for f in matches:
+            try:
+                os.remove(f)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                app_log(f"Screenshot cleanup warning: {e}", "warning")
+
+        return img_copy
+
+class MssCaptureBackend:
+    name = "mss"
+
+    def __init__(self):
+        # mss handles hold an X11 connection + XShm segment and are not
+        # safe to share between threads, so keep one per thread.
+        self.local = threading.local()
+
+    def handle(self):
+        sct = getattr(self.local, 'sct', None)
+        if sct is None:
+            sct = mss.mss()
+            self.local.sct = sct
+        return sct
+
+    def bounds(self):
+        monitor = self.handle().monitors[0]
+        return monitor['left'], monitor['top'], monitor['width'], monitor['height']
+
+    def grab(self, region=None):
+        sct = self.handle()
+        if region is not None:
+            x, y, w, h = region
+            monitor = {'left': x, 'top': y, 'width': w, 'height': h}
+        else:
+            monitor = sct.monitors[0]
+        shot = sct.grab(monitor)
+        return Image.frombytes('RGB', shot.size, shot.bgra, 'raw', 'BGRX')
+
+class ScreenCapture:
+    def __init__(self, screenshot_dir):
+        self.backends = []
+        if MSS_AVAILABLE:
+            self.backends.append(MssCaptureBackend())
+        self.backends.append(ScrotCaptureBackend(screenshot_dir))
+        self.max_consecutive_failures = 5
+        self.retry_after = 30.0
+        self.lock = threading.Lock()
+        self.stats = {}
+        for backend in self.backends:
+            self.stats[backend.name] = {'captures': 0, 'failures': 0, 'total_time': 0.0, 'last_time': 0.0,
+                                        'consecutive_failures': 0, 'demoted': False, 'retry_at': 0.0}
+
+    def grab(self, region=None):
+        now = time.monotonic()
+        with self.lock:
+            # Demoted backends go last, except for one probe in their normal place
+            # every retry_after seconds so a transient outage does not stick
+            probing = set()
+            for backend in self.backends:
+                stats = self.stats[backend.name]
+                if stats['demoted'] and now >= stats['retry_at']:
+                    stats['retry_at'] = now + self.retry_after
+                    probing.add(backend.name)
+            order = sorted(self.backends, key=lambda backend: self.stats[backend.name]['demoted']
+                           and backend.name not in probing)
+        for backend in order:
+            start = time.perf_counter()
+            try:
+                img = backend.grab(region)
+            except Exception as e:
+                img = None
+                if not self.stats[backend.name]['demoted']:
+                    app_log(f"{backend.name} capture failed: {e}", "warning")
+            elapsed = time.perf_counter() - start
+            demoted = recovered = False
+            with self.lock:
+                stats = self.stats[backend.name]
+                if img is None:
+                    stats['failures'] += 1
+                    stats['consecutive_failures'] += 1
+                    if (not stats['demoted'] and len(self.backends) > 1 and
+                            stats['consecutive_failures'] >= self.max_consecutive_failures):
+                        stats['demoted'] = demoted = True
+                        stats['retry_at'] = time.monotonic() + self.retry_after
+                else:
+                    recovered = stats['demoted']
+                    stats['demoted'] = False
+                    stats['consecutive_failures'] = 0
+                    stats['captures'] += 1
+                    stats['total_time'] += elapsed
+                    stats['last_time'] = elapsed
+                    captures = stats['captures']
+            if demoted:
+                app_log(f"{backend.name} capture failed {self.max_consecutive_failures} times in a row; "
+                        f"demoting it behind the other backends", "warning")
+            if recovered:
+                app_log(f"{backend.name} capture is working again; restoring it", "info")
+            if img is None:
+                continue
+            if captures % 50 == 0:
+                app_log(f"Capture [{backend.name}] {img.size[0]}x{img.size[1]}: "
+                        f"last {elapsed * 1000:.1f}ms, avg {self.average_time(backend.name) * 1000:.1f}ms "
+                        f"over {captures} frames", "info")
+            return img
+        return None
+
+    def bounds(self):
+        for backend in self.backends:
+            if hasattr(backend, 'bounds'):
+                try:
+                    return backend.bounds()
+                except Exception:
+                    pass
+        w, h = pyautogui.size()
+        return 0, 0, w, h
+
+    def clamp(self, region):
+        # mss (XGetImage/XShmGetImage) rejects rectangles outside the root window
+        x, y, w, h = region
+        left, top, width, height = self.bounds()
+        x0, y0 = max(x, left), max(y, top)
+        x1, y1 = min(x + w, left + width), min(y + h, top + height)
+        if x1 <= x0 or y1 <= y0:
+            return None
+        return x0, y0, x1 - x0, y1 - y0
+
+    def average_time(self, name):
+        with self.lock:
+            stats = self.stats.get(name)
+            if not stats or not stats['captures']:
+                return 0.0
+            return stats['total_time'] / stats['captures']
+
+    def summary(self):
+        parts = []
+        for backend in self.backends:
+            stats = self.stats[backend.name]
+            demoted = " (demoted)" if stats['demoted'] else ""
+            parts.append(f"{backend.name}{demoted}: {stats['captures']} ok / {stats['failures']} failed, "
+                         f"avg {self.average_time(backend.name) * 1000:.1f}ms")
+        return "; ".join(parts)
+
+class WindowRegionTracker:
+    def __init__(self, refresh_interval=2.0):
+        self.lock = threading.Lock()
+        self.refresh_interval = refresh_interval
+        self.window_name = None
+        self.window_id = None
+        self.geometry = None
+        self.last_refresh = 0.0
+
+    def query(self, target):
+        cmd = ["xdotool", "getactivewindow", "getwindowname", "getwindowgeometry", "--shell"]
+        output = subprocess.check_output(cmd, stderr=subprocess.DEVNULL, timeout=2).decode()
+        lines = output.strip().splitlines()
+        if not lines or (target and target not in lines[0].lower()):
+            return None, None
+        values = {}
+        for line in lines[1:]:
+            key, _, value = line.partition('=')
+            values[key.strip()] = value.strip()
+        geometry = (int(values['X']), int(values['Y']), int(values['WIDTH']), int(values['HEIGHT']))
+        if geometry[2] <= 0 or geometry[3] <= 0:
+            return None, None
+        return values.get('WINDOW'), geometry
+
+    def get(self, window_name):
+        target = window_name.lower().strip()
+        with self.lock:
+            now = time.time()
+            if (self.geometry is not None and target == self.window_name
+                    and now - self.last_refresh < self.refresh_interval):
+                return self.geometry
+            try:
+                window_id, geometry = self.query(target)
+            except Exception:
+                window_id, geometry = None, None
+            self.last_refresh = now
+            if geometry is None:
+                # Target not in front right now; keep the last known rectangle
+                return self.geometry if target == self.window_name else None
+            if target != self.window_name or window_id != self.window_id:
+                app_log(f"Tracking window {window_id} at {geometry[2]}x{geometry[3]}+{geometry[0]}+{geometry[1]}", "info")
+            elif geometry != self.geometry:
+                app_log(f"Target window moved/resized to {geometry[2]}x{geometry[3]}+{geometry[0]}+{geometry[1]}", "info")
+            self.window_name = target
+            self.window_id = window_id
+            self.geometry = geometry
+            return geometry
+
+    def invalidate(self):
+        with self.lock:
+            self.geometry = None
+            self.window_id = None
+            self.last_refresh = 0.0
+
+class FrameChangeGate:
+    def __init__(self, threshold=0.002, pixel_delta=16, signature_width=160):
+        self.lock = threading.Lock()
+        self.threshold = threshold
+        self.pixel_delta = pixel_delta
+        self.signature_width = signature_width
+        self.last_signature = None
+        self.last_verdict = None
+        self.frames_skipped = 0
+        self.frames_analysed = 0
+
+    def signature(self, frame):
+        w, h = frame.size
+        sig_w = min(self.signature_width, w)
+        sig_h = max(1, int(h * sig_w / w))
+        small = frame.resize((sig_w, sig_h), Image.BOX).convert('L')
+        return np.asarray(small, dtype=np.int16)
+
+    def check(self, frame):
+        signature = self.signature(frame)
+        with self.lock:
+            previous = self.last_signature
+            if previous is None or self.last_verdict is None or previous.shape != signature.shape:
+                return signature, True, None
+            changed = np.count_nonzero(np.abs(signature - previous) > self.pixel_delta)
+            if changed / signature.size > self.threshold:
+                return signature, True, None
+            self.frames_skipped += 1
+            return signature, False, self.last_verdict
+
+    def commit(self, signature, verdict):
+        with self.lock:
+            self.last_signature = signature
+            self.last_verdict = verdict
+            self.frames_analysed += 1
+
+    def reset(self):
+        with self.lock:
+            self.last_signature = None
+            self.last_verdict = None
+
+    def summary(self):
+        with self.lock:
+            total = self.frames_skipped + self.frames_analysed
+            ratio = (self.frames_skipped / total * 100) if total else 0.0
+            return f"{self.frames_analysed} analysed, {self.frames_skipped} skipped ({ratio:.0f}% unchanged)"
+
+class ColorPrefilter:
+    def __init__(self):
+        self.enabled = False
+        self.colors = []
+        self.tolerance = 24
+        self.min_bar_height = 40
+        self.max_bar_width = 8
+        self.embed_width = 0.6
+        self.padding = 8
+        self.step = 2
+        self.lock = threading.Lock()
+        self.frames_checked = 0
+        self.frames_skipped = 0
+        self.candidates = 0
+
+    @staticmethod
+    def parse_color(value):
+        value = str(value).lstrip('#')
+        return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+
+    def set_colors(self, colors):
+        parsed = []
+        for color in colors:
+            try:
+                parsed.append(self.parse_color(color))
+            except (ValueError, IndexError):
+                app_log(f"Ignoring invalid embed color: {color}", "warning")
+        self.colors = parsed
+
+    def active(self):
+        return self.enabled and bool(self.colors)
+
+    def find(self, frame):
+        step = self.step
+        pixels = np.asarray(frame.convert('RGB'))[::step, ::step].astype(np.int16)
+        mask = np.zeros(pixels.shape[:2], dtype=bool)
+        for color in self.colors:
+            mask |= (np.abs(pixels - np.array(color, dtype=np.int16)) <= self.tolerance).all(axis=2)
+        min_run = max(1, self.min_bar_height // step)
+        columns = np.flatnonzero(mask.sum(axis=0) >= min_run)
+        boxes = []
+        frame_w, frame_h = frame.size
+        embed_width = int(frame_w * self.embed_width) if self.embed_width <= 1 else int(self.embed_width)
+        group_start = None
+        for i, column in enumerate(columns):
+            if group_start is None:
+                group_start = column
+            if i + 1 < len(columns) and columns[i + 1] == column + 1:
+                continue
+            if (column - group_start + 1) * step <= self.max_bar_width:
+                rows = mask[:, group_start:column + 1].any(axis=1).astype(np.int8)
+                edges = np.diff(np.concatenate(([0], rows, [0])))
+                for top, bottom in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)):
+                    if bottom - top < min_run:
+                        continue
+                    x = max(0, int(group_start) * step - self.padding)
+                    y = max(0, int(top) * step - self.padding)
+                    boxes.append((x, y, min(frame_w, x + embed_width), min(frame_h, int(bottom) * step + self.padding)))
+            group_start = None
+        with self.lock:
+            self.frames_checked += 1
+            if boxes:
+                self.candidates += len(boxes)
+            else:
+                self.frames_skipped += 1
+        return boxes
+
+    def summary(self):
+        with self.lock:
+            ratio = (self.frames_skipped / self.frames_checked * 100) if self.frames_checked else 0.0
+            return (f"{self.frames_checked} frames checked, {self.frames_skipped} skipped expensive detectors "
+                    f"({ratio:.0f}%), {self.candidates} candidate regions forwarded")
+
+class VerdictCache:
+    def __init__(self, max_age=1.5):
+        self.cond = threading.Condition()
+        self.max_age = max_age
+        self.verdict = None
+        self.timestamp = None
+        self.in_flight = False
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+
+    def is_fresh(self, max_age):
+        return self.timestamp is not None and time.monotonic() - self.timestamp <= max_age
+
+    def get(self, compute, max_age=None):
+        if max_age is None:
+            max_age = self.max_age
+        waited = False
+        with self.cond:
+            generation = self.generation
+            while True:
+                if waited and self.generation != generation and self.timestamp is not None:
+                    self.waits += 1
+                    return self.verdict
+                if not waited and self.is_fresh(max_age):
+                    self.hits += 1
+                    return self.verdict
+                if not self.in_flight:
+                    break
+                waited = True
+                self.cond.wait()
+            self.in_flight = True
+            self.misses += 1
+        completed = False
+        try:
+            verdict = compute()
+            completed = True
+            return verdict
+        finally:
+            with self.cond:
+                self.in_flight = False
+                if completed:
+                    self.verdict = verdict
+                    self.timestamp = time.monotonic()
+                self.generation += 1
+                self.cond.notify_all()
+
+    def invalidate(self):
+        with self.cond:
+            self.timestamp = None
+            self.verdict = None
+
+    def summary(self, commands_sent=0):
+        with self.cond:
+            total = self.hits + self.misses + self.waits
+            hit_rate = ((self.hits + self.waits) / total * 100) if total else 0.0
+            text = (f"{self.misses} detections run, {self.hits} cache hits, "
+                    f"{self.waits} waited on in-flight check ({hit_rate:.0f}% shared)")
+            if commands_sent:
+                text += f", {self.misses / commands_sent:.2f} detections per command"
+            return text
+
+class AntibotMonitor:
+    def __init__(self, gui, interval=1.0):
+        self.gui = gui
+        self.interval = interval
+        self.enabled = True
+        self.detected = threading.Event()
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.last_check = None
+        self.last_latency = 0.0
+        self.checks = 0
+
+    def start(self):
+        if not self.enabled or self.is_running():
+            return
+        # A stopped run may still be inside a slow check; it keeps its own
+        # (already set) event, so it exits instead of being revived
+        self.stop_event = threading.Event()
+        self.detected.clear()
+        with self.lock:
+            self.last_check = None
+        self.thread = threading.Thread(target=self.run, args=(self.stop_event,),
+                                       name="antibot-monitor", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive() and not self.stop_event.is_set()
+
+    def age(self):
+        with self.lock:
+            if self.last_check is None:
+                return None
+            return time.monotonic() - self.last_check
+
+    def is_stale(self):
+        age = self.age()
+        return age is None or age > max(3 * self.interval, 5.0)
+
+    def clear(self):
+        self.detected.clear()
+
+    def run(self, stop_event):
+        app_log(f"[monitor] Anti-bot monitor started ({self.interval:.1f}s interval)", "info")
+        while not stop_event.is_set() and self.gui.running:
+            if self.gui.paused:
+                stop_event.wait(self.interval)
+                continue
+            start = time.perf_counter()
+            try:
+                verdict = self.gui.verdict_cache.get(self.gui._detect_antibot_uncached, max_age=0)
+            except Exception as e:
+                app_log(f"[monitor] Detection error: {e}", "error")
+                verdict = False
+            elapsed = time.perf_counter() - start
+            if stop_event.is_set():
+                break
+            with self.lock:
+                self.last_check = time.monotonic()
+                self.last_latency = elapsed
+                self.checks += 1
+            if verdict is not False:
+                self.detected.set()
+                self.gui.pause_for_antibot("monitor", unknown=verdict is None)
+            else:
+                self.detected.clear()
+            stop_event.wait(max(0.0, self.interval - elapsed))
+        app_log("[monitor] Anti-bot monitor stopped", "info")
+
+    def status_text(self):
+        if not self.enabled:
+            return "Monitor: disabled"
+        if not self.is_running():
+            return f"Monitor: idle (every {self.interval:.1f}s)"
+        age = self.age()
+        with self.lock:
+            latency = self.last_latency
+        if age is None:
+            return f"Monitor: every {self.interval:.1f}s | waiting for first check"
+        text = f"Monitor: every {self.interval:.1f}s | last {age:.1f}s ago | {latency * 1000:.0f}ms"
+        if self.gui.detection_pool.enabled:
+            text += f" | OCR queue {self.gui.detection_pool.queue_depth()}"
+        return text
+
+class PytesseractEngine:
+    name = "pytesseract"
+
+    def __init__(self, lang='eng', psm=None):
+        self.lang = lang
+        self.psm = psm
+        self.timeout = 0
+
+    def warm_up(self):
+        pytesseract.get_tesseract_version()
+
+    def recognize(self, image):
+        config = f"--psm {self.psm}" if self.psm is not None else ""
+        # pytesseract kills the tesseract child once the timeout expires
+        return pytesseract.image_to_string(image, lang=self.lang, config=config, timeout=self.timeout)
+
+    def recognize_lines(self, image):
+        config = f"--psm {self.psm}" if self.psm is not None else ""
+        data = pytesseract.image_to_data(image, lang=self.lang, config=config, timeout=self.timeout,
+                                         output_type=pytesseract.Output.DICT)
+        lines = OrderedDict()
+        for i, word in enumerate(data['text']):
+            if not word.strip():
+                continue
+            key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+            top = data['top'][i]
+            bottom = top + data['height'][i]
+            line = lines.get(key)
+            if line is None:
+                lines[key] = [top, bottom, [word]]
+            else:
+                line[0] = min(line[0], top)
+                line[1] = max(line[1], bottom)
+                line[2].append(word)
+        return [(top, bottom, " ".join(words)) for top, bottom, words in lines.values()]
+
+    def close(self):
+        pass
+
+class TesserocrEngine:
+    name = "tesserocr"
+
+    def __init__(self, lang='eng', psm=None):
+        self.lang = lang
+        self.psm = psm
+        # One long-lived TessBaseAPI handle; it is not thread-safe.
+        self.lock = threading.Lock()
+        self.api = None
+
+    def _ensure_api(self):
+        if self.api is None:
+            self.api = tesserocr.PyTessBaseAPI(lang=self.lang)
+        if self.psm is not None and self.api.GetPageSegMode() != self.psm:
+            self.api.SetPageSegMode(self.psm)
+        return self.api
+
+    def warm_up(self):
+        with self.lock:
+            api = self._ensure_api()
+            api.SetImage(Image.new('L', (64, 16), 255))
+            api.GetUTF8Text()
+
+    def recognize(self, image):
+        with self.lock:
+            api = self._ensure_api()
+            api.SetImage(image)
+            return api.GetUTF8Text()
+
+    def recognize_lines(self, image):
+        level = tesserocr.RIL.TEXTLINE
+        with self.lock:
+            api = self._ensure_api()
+            api.SetImage(image)
+            api.Recognize()
+            lines = []
+            for line in tesserocr.iterate_level(api.GetIterator(), level):
+                text = line.GetUTF8Text(level)
+                box = line.BoundingBox(level)
+                if text and box:
+                    lines.append((box[1], box[3], text.strip()))
+            return lines
+
+    def close(self):
+        with self.lock:
+            if self.api is not None:
+                self.api.End()
+                self.api = None
+
+class OCREngine:
+    def __init__(self, preferred="auto", lang='eng', psm=4):
+        self.engines = []
+        if TESSEROCR_AVAILABLE:
+            self.engines.append(TesserocrEngine(lang, psm))
+        if PYTESSERACT_AVAILABLE:
+            self.engines.append(PytesseractEngine(lang, psm))
+        self.psm = psm
+        self.set_preferred(preferred)
+        self.lock = threading.Lock()
+        self.stats = {}
+        for engine in self.engines:
+            self.stats[engine.name] = {'calls': 0, 'failures': 0, 'total_time': 0.0}
+
+    def set_preferred(self, preferred):
+        self.preferred = preferred
+        if preferred != "auto":
+            self.engines.sort(key=lambda engine: engine.name != preferred)
+
+    def set_psm(self, psm):
+        self.psm = psm
+        for engine in self.engines:
+            engine.psm = psm
+
+    def warm_up(self):
+        for engine in self.engines:
+            start = time.perf_counter()
+            try:
+                engine.warm_up()
+                app_log(f"OCR engine {engine.name} ready ({(time.perf_counter() - start) * 1000:.0f}ms warm-up)", "info")
+            except Exception as e:
+                app_log(f"OCR engine {engine.name} unavailable: {e}", "warning")
+                with self.lock:
+                    self.stats[engine.name]['failures'] += 1
+
+    def active_name(self):
+        return self.engines[0].name if self.engines else "none"
+
+    def recognize(self, image):
+        return self.call('recognize', image)
+
+    def recognize_lines(self, image):
+        return self.call('recognize_lines', image)
+
+    def call(self, method, image):
+        last_error = None
+        for engine in self.engines:
+            start = time.perf_counter()
+            try:
+                text = getattr(engine, method)(image)
+            except Exception as e:
+                last_error = e
+                with self.lock:
+                    self.stats[engine.name]['failures'] += 1
+                continue
+            with self.lock:
+                stats = self.stats[engine.name]
+                stats['calls'] += 1
+                stats['total_time'] += time.perf_counter() - start
+            return text
+        if last_error is not None:
+            raise last_error
+        raise RuntimeError("No OCR engine available")
+
+    def close(self):
+        for engine in self.engines:
+            try:
+                engine.close()
+            except Exception:
+                pass
+
+    def summary(self):
+        parts = []
+        with self.lock:
+            for name, stats in self.stats.items():
+                avg = (stats['total_time'] / stats['calls'] * 1000) if stats['calls'] else 0.0
+                parts.append(f"{name}: {stats['calls']} calls, {stats['failures']} failures, avg {avg:.0f}ms")
+        return "; ".join(parts)
+
+class OCRPreprocessor:
+    def __init__(self):
+        self.enabled = True
+        self.crop = None
+        self.target_text_height = 24
+        self.threshold = 0
+        self.background_delta = 48
+        self.invert = True
+        self.scale = 1.0
+        self.lock = threading.Lock()
+        self.stage_times = {}
+        self.frames = 0
+
+    def background_color(self, rgb):
+        # Mode of a subsample at 5 bits per channel, refined to the mean of that bin
+        sample = rgb[::4, ::4].reshape(-1, 3)
+        bins = ((sample[:, 0] >> 3).astype(np.int32) << 10) | ((sample[:, 1] >> 3).astype(np.int32) << 5) | (sample[:, 2] >> 3)
+        mode = np.argmax(np.bincount(bins, minlength=32768))
+        return sample[bins == mode].mean(axis=0)
+
+    def contrast_map(self, rgb):
+        # Largest per-channel distance from the background colour. Unlike a global
+        # Otsu cut on luma this keeps saturated text such as the link blue (#00a8fc,
+        # luma ~127) that sits right at a dark-theme luma threshold
+        background = self.background_color(rgb)
+        contrast = None
+        for channel in range(3):
+            # uint8 |a - b| via max - min avoids widening the whole frame
+            plane = rgb[:, :, channel]
+            value = np.uint8(round(background[channel]))
+            diff = np.maximum(plane, value) - np.minimum(plane, value)
+            contrast = diff if contrast is None else np.maximum(contrast, diff, out=contrast)
+        return contrast
+
+    def estimate_text_height(self, text_mask):
+        coverage = text_mask.mean(axis=1)
+        rows = ((coverage > 0.005) & (coverage < 0.6)).astype(np.int8)
+        edges = np.diff(np.concatenate(([0], rows, [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        heights = ends - starts
+        heights = heights[(heights >= 4) & (heights <= 200)]
+        if heights.size == 0:
+            return None
+        return float(np.median(heights))
+
+    def process(self, image):
+        timings = {}
+        start = time.perf_counter()
+        if self.crop:
+            w, h = image.size
+            left, top, right, bottom = self.crop
+            image = image.crop((int(w * left), int(h * top), int(w * right), int(h * bottom)))
+        timings['crop'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        gray = self.contrast_map(np.asarray(image.convert('RGB')))
+        threshold = self.threshold or self.background_delta
+        timings['gray'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        text_height = self.estimate_text_height(gray > threshold)
+        if text_height:
+            scale = max(0.25, min(1.0, self.target_text_height / text_height))
+            # Hysteresis keeps the output geometry stable between frames
+            if abs(scale / self.scale - 1.0) > 0.15:
+                self.scale = scale
+        scale = self.scale
+        if scale < 1.0:
+            h, w = gray.shape
+            size = (max(1, int(w * scale)), max(1, int(h * scale)))
+            gray = np.asarray(Image.fromarray(gray).resize(size, Image.BILINEAR))
+        timings['scale'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        # Anything far enough from the background is ink, on light or dark themes
+        text_mask = gray > threshold
+        if self.invert:
+            binary = np.where(text_mask, 0, 255).astype(np.uint8)
+        else:
+            binary = np.where(text_mask, 255, 0).astype(np.uint8)
+        timings['binarize'] = time.perf_counter() - start
+
+        with self.lock:
+            self.frames += 1
+            for stage, elapsed in timings.items():
+                self.stage_times[stage] = self.stage_times.get(stage, 0.0) + elapsed
+        return Image.fromarray(binary)
+
+    def record_ocr_time(self, elapsed):
+        with self.lock:
+            self.stage_times['ocr'] = self.stage_times.get('ocr', 0.0) + elapsed
+
+    def summary(self):
+        with self.lock:
+            if not self.frames:
+                return "no frames"
+            parts = [f"{stage} {total / self.frames * 1000:.1f}ms" for stage, total in self.stage_times.items()]
+            return f"{self.frames} frames, avg " + ", ".join(parts)
+
+class IncrementalOCR:
+    def __init__(self):
+        self.enabled = True
+        self.lock = threading.Lock()
+        self.bins = 8
+        self.row_tolerance = 6.0
+        self.max_shift_ratio = 0.5
+        self.max_strip_ratio = 0.6
+        self.overlap_rows = 4
+        self.full_pass_interval = 30
+        self.signature = None
+        self.segments = []
+        self.since_full_pass = 0
+        self.full_passes = 0
+        self.strip_passes = 0
+        self.unchanged = 0
+        self.strip_rows = 0
+        self.total_rows = 0
+
+    def row_signature(self, pixels):
+        h, w = pixels.shape
+        usable = w - w % self.bins
+        return pixels[:, :usable].reshape(h, self.bins, -1).mean(axis=2, dtype=np.float32)
+
+    def find_shift(self, previous, current):
+        h = current.shape[0]
+        prev_profile = previous.mean(axis=1)
+        curr_profile = current.mean(axis=1)
+        best_shift, best_error = None, None
+        for shift in range(0, int(h * self.max_shift_ratio) + 1):
+            error = np.abs(prev_profile[shift:] - curr_profile[:h - shift]).mean()
+            if best_error is None or error < best_error:
+                best_shift, best_error = shift, error
+                if error == 0:
+                    break
+        return best_shift
+
+    def plan(self, signature):
+        previous = self.signature
+        if (previous is None or previous.shape != signature.shape
+                or self.since_full_pass >= self.full_pass_interval):
+            return None
+        h = signature.shape[0]
+        shift = self.find_shift(previous, signature)
+        # Rows that do not line up with the previous frame after scrolling
+        row_error = np.abs(previous[shift:] - signature[:h - shift]).max(axis=1)
+        changed = np.flatnonzero(row_error > self.row_tolerance)
+        top = h - shift
+        if changed.size:
+            top = min(top, int(changed[0]))
+        if top >= h:
+            return shift, h
+        top = max(0, top - self.overlap_rows)
+        if h - top > h * self.max_strip_ratio:
+            return None
+        return shift, top
+
+    def run(self, image, recognize):
+        pixels = np.asarray(image)
+        with self.lock:
+            signature = self.row_signature(pixels)
+            h = pixels.shape[0]
+            plan = self.plan(signature) if self.enabled else None
+            if plan is None:
+                text = recognize(image)
+                self.segments = [[0, h, text]]
+                self.since_full_pass = 0
+                self.full_passes += 1
+                self.strip_rows += h
+            else:
+                shift, top = plan
+                segments = []
+                for segment in self.segments:
+                    segment[0] -= shift
+                    segment[1] -= shift
+                    if segment[1] <= 0 or segment[0] >= top:
+                        continue
+                    segments.append(segment)
+                if top < h:
+                    text = recognize(image.crop((0, top, image.size[0], h)))
+                    segments.append([top, h, text])
+                    self.strip_passes += 1
+                    self.strip_rows += h - top
+                else:
+                    self.unchanged += 1
+                self.segments = segments
+                self.since_full_pass += 1
+            self.total_rows += h
+            self.signature = signature
+            return "\n".join(segment[2] for segment in self.segments)
+
+    def reset(self):
+        with self.lock:
+            self.signature = None
+            self.segments = []
+
+    def summary(self):
+        with self.lock:
+            ratio = (self.strip_rows / self.total_rows * 100) if self.total_rows else 0.0
+            return (f"{self.full_passes} full, {self.strip_passes} strip, {self.unchanged} unchanged; "
+                    f"{ratio:.0f}% of rows sent to OCR")
+
+class TileOCRCache:
+    def __init__(self, max_entries=512, max_bytes=256 * 1024):
+        self.enabled = True
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ink_contrast = 32
+        self.min_gap = 3
+        self.padding = 2
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.bytes_held = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.batches = 0
+
+    def split(self, pixels):
+        ink = (pixels.max(axis=1).astype(np.int16) - pixels.min(axis=1)) > self.ink_contrast
+        edges = np.diff(np.concatenate(([0], ink.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        tiles = []
+        for top, bottom in zip(starts, ends):
+            if tiles and top - tiles[-1][1] < self.min_gap:
+                tiles[-1][1] = bottom
+            else:
+                tiles.append([top, bottom])
+        return [(int(top), int(bottom)) for top, bottom in tiles if bottom - top >= 3]
+
+    def tile_key(self, tile):
+        # Trim to the ink bounding box so the key does not depend on position
+        columns = (tile.max(axis=0).astype(np.int16) - tile.min(axis=0)) > self.ink_contrast
+        cols = np.flatnonzero(columns)
+        if cols.size:
+            tile = tile[:, cols[0]:cols[-1] + 1]
+        digest = hashlib.blake2b(tile.tobytes(), digest_size=16)
+        digest.update(np.asarray(tile.shape, dtype=np.int32).tobytes())
+        return digest.digest()
+
+    def lookup(self, key):
+        with self.lock:
+            text = self.entries.get(key)
+            if text is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return text
+
+    def store(self, key, text):
+        size = len(key) + len(text.encode('utf-8'))
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = text
+            self.bytes_held += size
+            while self.entries and (len(self.entries) > self.max_entries or self.bytes_held > self.max_bytes):
+                old_key, old_text = self.entries.popitem(last=False)
+                self.bytes_held -= len(old_key) + len(old_text.encode('utf-8'))
+                self.evictions += 1
+
+    def recognize(self, image, recognize_batch):
+        pixels = np.asarray(image.convert('L'))
+        if not self.enabled:
+            return "\n".join(recognize_batch(pixels, [(0, pixels.shape[0])])).strip()
+        tiles = self.split(pixels)
+        if not tiles:
+            return ""
+        texts = []
+        missed = []
+        for top, bottom in tiles:
+            key = self.tile_key(pixels[top:bottom])
+            text = self.lookup(key)
+            if text is None:
+                missed.append((len(texts), key, (max(0, top - self.padding), bottom + self.padding)))
+            texts.append(text)
+        if missed:
+            # One engine call for every missed line instead of one per line
+            results = recognize_batch(pixels, [rows for _, _, rows in missed])
+            with self.lock:
+                self.batches += 1
+            for (index, key, _), text in zip(missed, results):
+                text = text.strip()
+                self.store(key, text)
+                texts[index] = text
+        return "\n".join(text for text in texts if text)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes_held = 0
+
+    def summary(self):
+        with self.lock:
+            total = self.hits + self.misses
+            hit_rate = (self.hits / total * 100) if total else 0.0
+            return (f"{len(self.entries)}/{self.max_entries} tiles, {self.bytes_held / 1024:.1f}KB held, "
+                    f"{hit_rate:.0f}% hit rate ({self.hits} hits, {self.misses} misses in {self.batches} OCR calls, "
+                    f"{self.evictions} evicted)")
+
+def stack_rows(pixels, ranges, gap=12):
+    # Background is the most common value, so the gaps read as blank paper
+    background = int(np.bincount(pixels.ravel(), minlength=256).argmax())
+    spacer = np.full((gap, pixels.shape[1]), background, dtype=pixels.dtype)
+    blocks = []
+    offsets = []
+    y = 0
+    for top, bottom in ranges:
+        block = pixels[top:bottom]
+        offsets.append((y, y + block.shape[0]))
+        blocks.extend((block, spacer))
+        y += block.shape[0] + gap
+    return np.vstack(blocks), offsets
+
+def split_lines(lines, offsets):
+    texts = [[] for _ in offsets]
+    for top, bottom, text in lines:
+        center = (top + bottom) / 2
+        index = min(range(len(offsets)), key=lambda i: max(offsets[i][0] - center, center - offsets[i][1] + 1, 0))
+        texts[index].append(text)
+    return ["\n".join(parts) for parts in texts]
+
+def recognize_stacked(pixels, ranges, recognize_lines):
+    stacked, offsets = stack_rows(pixels, ranges)
+    return split_lines(recognize_lines(Image.fromarray(stacked)), offsets)
+
+TEMPLATE_SCALES = [0.8, 0.9, 1.0, 1.1, 1.2]
+
+def _fast_fft_size(n):
+    size = n
+    while True:
+        m = size
+        for factor in (2, 3, 5):
+            while m % factor == 0:
+                m //= factor
+        if m == 1:
+            return size
+        size += 1
+
+def _integral_image(values):
+    integral = np.zeros((values.shape[0] + 1, values.shape[1] + 1), dtype=np.float64)
+    np.cumsum(np.cumsum(values, axis=0), axis=1, out=integral[1:, 1:])
+    return integral
+
+def _box_sums(integral, h, w):
+    return integral[h:, w:] - integral[:-h, w:] - integral[h:, :-w] + integral[:-h, :-w]
+
+class PreparedTemplate:
+    def __init__(self, array):
+        self.array = array
+        self.shape = array.shape
+        self.mean = float(array.mean())
+        centered = array - self.mean
+        self.flipped = np.ascontiguousarray(centered[::-1, ::-1])
+        self.norm = float(np.sqrt(np.sum(centered * centered)))
+        # Small LRU: only the few FFT shapes of the current window size stay hot,
+        # while resizes, pre-filter crops and clipped windows would otherwise pile up
+        self.max_spectra = 4
+        self.lock = threading.Lock()
+        self.spectra = OrderedDict()
+
+    def spectrum(self, shape):
+        with self.lock:
+            spectrum = self.spectra.get(shape)
+            if spectrum is not None:
+                self.spectra.move_to_end(shape)
+                return spectrum
+        spectrum = np.fft.rfft2(self.flipped, shape)
+        with self.lock:
+            self.spectra[shape] = spectrum
+            while len(self.spectra) > self.max_spectra:
+                self.spectra.popitem(last=False)
+        return spectrum
+
+class FramePrep:
+    def __init__(self, frame, depth=0):
+        self.levels = build_pyramid(frame, depth)
+        self.lock = threading.Lock()
+        self.spectra = {}
+        self.integrals = {}
+        self.deviations = {}
+
+    def spectrum(self, level):
+        with self.lock:
+            cached = self.spectra.get(level)
+        if cached is None:
+            frame = self.levels[level]
+            shape = (_fast_fft_size(frame.shape[0]), _fast_fft_size(frame.shape[1]))
+            cached = (shape, np.fft.rfft2(frame, shape))
+            with self.lock:
+                cached = self.spectra.setdefault(level, cached)
+        return cached
+
+    def integral(self, level):
+        with self.lock:
+            cached = self.integrals.get(level)
+        if cached is None:
+            frame = self.levels[level]
+            cached = (_integral_image(frame), _integral_image(frame * frame))
+            with self.lock:
+                cached = self.integrals.setdefault(level, cached)
+        return cached
+
+    def deviation(self, level, h, w):
+        key = (level, h, w)
+        with self.lock:
+            cached = self.deviations.get(key)
+        if cached is None:
+            # Windowed standard deviation (times sqrt(n)); shared by every
+            # template of the same size at this level
+            integral, integral_sq = self.integral(level)
+            sums = _box_sums(integral, h, w)
+            sums_sq = _box_sums(integral_sq, h, w)
+            cached = np.sqrt(np.maximum(sums_sq - sums * sums / (h * w), 0.0))
+            with self.lock:
+                cached = self.deviations.setdefault(key, cached)
+        return cached
+
+    def ncc(self, level, template):
+        if not isinstance(template, PreparedTemplate):
+            template = PreparedTemplate(template)
+        frame_h, frame_w = self.levels[level].shape
+        h, w = template.shape
+        if h > frame_h or w > frame_w or template.norm == 0:
+            return None
+        # The frame spectrum and integral images are computed once per frame
+        # and shared by every template; template spectra are cached per shape.
+        shape, frame_spectrum = self.spectrum(level)
+        # Correlation as convolution with the flipped template; no wrap-around
+        # reaches the valid region because the FFT is at least frame-sized.
+        correlation = np.fft.irfft2(frame_spectrum * template.spectrum(shape), shape)[h - 1:frame_h, w - 1:frame_w]
+        denominator = self.deviation(level, h, w) * template.norm
+        scores = np.zeros_like(correlation)
+        np.divide(correlation, denominator, out=scores, where=denominator > 1e-6)
+        return scores
+
+def match_template_ncc(frame, template):
+    return FramePrep(frame).ncc(0, template)
+
+TemplateHit = namedtuple('TemplateHit', ['name', 'x', 'y', 'scale', 'score'])
+
+def best_match(scores):
+    index = int(np.argmax(scores))
+    y, x = divmod(index, scores.shape[1])
+    return x, y, float(scores[y, x])
+
+def downsample2(image):
+    h, w = image.shape
+    h -= h % 2
+    w -= w % 2
+    return image[:h, :w].reshape(h // 2, 2, w // 2, 2).mean(axis=(1, 3))
+
+def build_pyramid(image, depth, min_size=8):
+    levels = [image]
+    while len(levels) <= depth and min(levels[-1].shape) // 2 >= min_size:
+        levels.append(downsample2(levels[-1]))
+    return levels
+
+def top_k_peaks(scores, k, radius):
+    scores = scores.copy()
+    peaks = []
+    for _ in range(k):
+        x, y, score = best_match(scores)
+        if score <= 0:
+            break
+        peaks.append((x, y, score))
+        scores[max(0, y - radius):y + radius + 1, max(0, x - radius):x + radius + 1] = -1.0
+    return peaks
+
+def match_template_window(frame, template, x0, y0, x1, y1):
+    h, w = template.shape
+    x0, y0 = max(0, x0), max(0, y0)
+    x1 = min(x1, frame.shape[1] - w)
+    y1 = min(y1, frame.shape[0] - h)
+    if x1 < x0 or y1 < y0:
+        return None
+    scores = match_template_ncc(frame[y0:y1 + h, x0:x1 + w], template)
+    if scores is None:
+        return None
+    x, y, score = best_match(scores)
+    return x + x0, y + y0, score
+
+def search_template(prep, key, levels, top_k, radius=2, cancel=None):
+    name, scale = key
+    level_stats = []
+    start = time.perf_counter()
+    if len(prep.levels) == 1:
+        scores = prep.ncc(0, levels[0])
+        if scores is None:
+            return None, level_stats
+        x, y, score = best_match(scores)
+        level_stats.append((0, time.perf_counter() - start, 1))
+        return TemplateHit(name, x, y, scale, score), level_stats
+
+    # Never go deeper than the frame pyramid or the template allows
+    levels = levels[:len(prep.levels)]
+    top = len(levels) - 1
+    scores = prep.ncc(top, levels[top])
+    if scores is None:
+        return None, level_stats
+    suppress = max(1, min(levels[top].shape) // 2)
+    candidates = [(score, x, y) for x, y, score in top_k_peaks(scores, top_k, suppress)]
+    level_stats.append((top, time.perf_counter() - start, len(candidates)))
+
+    for level in range(top - 1, -1, -1):
+        if cancel is not None and cancel.is_set():
+            return None, level_stats
+        start = time.perf_counter()
+        refined = []
+        for score, x, y in candidates:
+            r = radius * 2
+            match = match_template_window(prep.levels[level], levels[level],
+                                          x * 2 - r, y * 2 - r, x * 2 + r, y * 2 + r)
+            if match is not None:
+                refined.append((match[2], match[0], match[1]))
+        candidates = sorted(refined, reverse=True)
+        level_stats.append((level, time.perf_counter() - start, len(candidates)))
+
+    if not candidates:
+        return None, level_stats
+    score, x, y = candidates[0]
+    return TemplateHit(name, x, y, scale, score), level_stats
+
+class LinkedEvent:
+    def __init__(self, parent=None):
+        self.event = threading.Event()
+        self.parent = parent
+
+    def set(self):
+        self.event.set()
+
+    def is_set(self):
+        return self.event.is_set() or (self.parent is not None and self.parent.is_set())
+
+class DetectionRace:
+    def __init__(self):
+        self.cancel = threading.Event()
+        self.winner = None
+
+class ParallelMatcher:
+    def __init__(self, workers=4):
+        self.workers = workers
+        self.lock = threading.Lock()
+        self.executor = None
+        self.executor_workers = 0
+        self.searches = 0
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.cancelled = 0
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None or self.executor_workers != self.workers:
+                if self.executor is not None:
+                    self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="matcher")
+                self.executor_workers = self.workers
+            return self.executor
+
+    def search(self, prep, templates, top_k, threshold, cancel=None):
+        wall_start = time.perf_counter()
+        # Our own early-exit flag: it honours the caller's event but never sets it
+        cancel = LinkedEvent(cancel)
+        best = None
+        level_stats = []
+        cpu_time = 0.0
+        cancelled = 0
+
+        def job(key, levels):
+            if cancel.is_set():
+                return None, [], 0.0
+            start = time.thread_time()
+            hit, stats = search_template(prep, key, levels, top_k, cancel=cancel)
+            return hit, stats, time.thread_time() - start
+
+        if self.workers <= 1 or len(templates) <= 1:
+            results = (job(key, levels) for key, levels in templates)
+            futures = None
+        else:
+            # The coarsest level's FFT and integrals are shared by every job
+            prep.spectrum(len(prep.levels) - 1)
+            prep.integral(len(prep.levels) - 1)
+            executor = self.get_executor()
+            futures = [executor.submit(job, key, levels) for key, levels in templates]
+            results = (future.result() for future in as_completed(futures) if not future.cancelled())
+
+        for hit, stats, job_cpu in results:
+            cpu_time += job_cpu
+            level_stats.extend(stats)
+            if hit is not None and (best is None or hit.score > best.score):
+                best = hit
+            if cancel.is_set() or (best is not None and best.score >= threshold):
+                cancel.set()
+                if futures is not None:
+                    cancelled = sum(1 for future in futures if future.cancel())
+                break
+
+        with self.lock:
+            self.searches += 1
+            self.wall_time += time.perf_counter() - wall_start
+            self.cpu_time += cpu_time
+            self.cancelled += cancelled
+        return best, level_stats
+
+    def shutdown(self):
+        with self.lock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
+
+    def summary(self):
+        with self.lock:
+            if not self.searches:
+                return f"{self.workers} workers, no searches"
+            wall = self.wall_time / self.searches * 1000
+            cpu = self.cpu_time / self.searches * 1000
+            ratio = (self.cpu_time / self.wall_time) if self.wall_time else 0.0
+            return (f"{self.workers} workers, avg wall {wall:.1f}ms vs summed CPU {cpu:.1f}ms "
+                    f"({ratio:.1f}x), {self.cancelled} jobs cancelled early")
+
+class TemplateCache:
+    def __init__(self, max_depth=5):
+        self.lock = threading.Lock()
+        self.max_depth = max_depth
+        self.path = None
+        self.mtime = None
+        self.scaled = []
+        self.loads = 0
+
+    def load(self, path):
+        mtime = os.stat(path).st_mtime
+        template = Image.open(path).convert('L')
+        scaled = []
+        for scale in TEMPLATE_SCALES:
+            new_w = int(template.width * scale)
+            new_h = int(template.height * scale)
+            if new_w < 10 or new_h < 10:
+                continue
+            array = np.asarray(template.resize((new_w, new_h), Image.LANCZOS), dtype=np.float64)
+            levels = [PreparedTemplate(level) for level in build_pyramid(array, self.max_depth)]
+            scaled.append((scale, levels))
+        template.close()
+        with self.lock:
+            self.path = path
+            self.mtime = mtime
+            self.scaled = scaled
+            self.loads += 1
+        return scaled
+
+    def get(self, path):
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return []
+        with self.lock:
+            if path == self.path and mtime == self.mtime:
+                return self.scaled
+        return self.load(path)
+
+    def invalidate(self):
+        with self.lock:
+            self.path = None
+            self.mtime = None
+            self.scaled = []
+
+class TemplateLibrary:
+    EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.caches = {}
+
+    def scan(self, directory):
+        if not directory or not os.path.isdir(directory):
+            return []
+        return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                      if name.lower().endswith(self.EXTENSIONS))
+
+    def sync(self, paths):
+        with self.lock:
+            caches = {}
+            for path in paths:
+                caches[path] = self.caches.get(path) or TemplateCache()
+            dropped = [cache for path, cache in self.caches.items() if path not in caches]
+            self.caches = caches
+        # Release the pyramids of removed templates now rather than whenever the
+        # last in-flight search lets go of its reference
+        for cache in dropped:
+            cache.invalidate()
+        for path, cache in caches.items():
+            try:
+                cache.get(path)
+            except Exception as e:
+                app_log(f"Failed to load template {os.path.basename(path)}: {e}", "warning")
+        return len(caches)
+
+    def entries(self, max_h, max_w):
+        with self.lock:
+            caches = list(self.caches.items())
+        entries = []
+        for path, cache in caches:
+            name = os.path.basename(path)
+            try:
+                scaled = cache.get(path)
+            except Exception:
+                continue
+            for scale, levels in scaled:
+                if levels[0].shape[0] <= max_h and levels[0].shape[1] <= max_w:
+                    entries.append(((name, scale), levels))
+        # Native scale first: it is the most likely hit and lets early exit kick in
+        entries.sort(key=lambda entry: abs(entry[0][1] - 1.0))
+        return entries
+
+    def paths(self):
+        with self.lock:
+            return list(self.caches)
+
+    def __len__(self):
+        with self.lock:
+            return len(self.caches)
+
+class HitPrior:
+    def __init__(self, capacity=4, radius=24):
+        self.enabled = True
+        self.capacity = capacity
+        self.radius = radius
+        self.lock = threading.Lock()
+        self.hits = []
+        self.prior_hits = 0
+        self.prior_misses = 0
+        self.full_hits = 0
+
+    def remember(self, hit):
+        with self.lock:
+            self.hits = [h for h in self.hits
+                         if (h.name, h.scale) != (hit.name, hit.scale)
+                         or abs(h.x - hit.x) > self.radius or abs(h.y - hit.y) > self.radius]
+            self.hits.insert(0, hit)
+            del self.hits[self.capacity:]
+
+    def check(self, frame, templates, threshold):
+        if not self.enabled:
+            return None
+        with self.lock:
+            hits = list(self.hits)
+        if not hits:
+            return None
+        by_key = dict(templates)
+        r = self.radius
+        for hit in hits:
+            levels = by_key.get((hit.name, hit.scale))
+            if levels is None:
+                continue
+            match = match_template_window(frame, levels[0], hit.x - r, hit.y - r, hit.x + r, hit.y + r)
+            if match is not None and match[2] >= threshold:
+                with self.lock:
+                    self.prior_hits += 1
+                return TemplateHit(hit.name, match[0], match[1], hit.scale, match[2])
+        with self.lock:
+            self.prior_misses += 1
+        return None
+
+    def record_full_hit(self):
+        with self.lock:
+            self.full_hits += 1
+
+    def clear(self):
+        with self.lock:
+            self.hits = []
+
+    def summary(self):
+        with self.lock:
+            return (f"{self.prior_hits} hits from location prior, {self.full_hits} from full search, "
+                    f"{self.prior_misses} prior misses")
+
+class SearchStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.levels = {}
+        self.searches = 0
+
+    def record(self, level_stats):
+        with self.lock:
+            self.searches += 1
+            for level, elapsed, candidates in level_stats:
+                totals = self.levels.setdefault(level, [0.0, 0])
+                totals[0] += elapsed
+                totals[1] += candidates
+
+    def summary(self):
+        with self.lock:
+            if not self.searches:
+                return "no searches"
+            parts = []
+            for level in sorted(self.levels, reverse=True):
+                elapsed, candidates = self.levels[level]
+                parts.append(f"L{level} {elapsed / self.searches * 1000:.1f}ms/{candidates / self.searches:.1f} cand")
+            return f"{self.searches} searches, avg " + ", ".join(parts)
+
+def match_template_legacy(screen_array, template, threshold=0.80, step=30, margin=50):
+    template_array = np.array(template)
+    screen_h, screen_w = screen_array.shape[:2]
+    template_h, template_w = template_array.shape[:2]
+    best_similarity = 0
+    for scale in TEMPLATE_SCALES:
+        new_w = int(template_w * scale)
+        new_h = int(template_h * scale)
+        if new_w > screen_w or new_h > screen_h or new_w < 10 or new_h < 10:
+            continue
+        template_resized_array = np.array(template.resize((new_w, new_h), Image.LANCZOS))
+        for y in range(margin, screen_h - new_h - margin, step):
+            for x in range(margin, screen_w - new_w - margin, step):
+                region = screen_array[y:y+new_h, x:x+new_w]
+                if region.shape == template_resized_array.shape:
+                    diff = np.abs(region.astype(float) - template_resized_array.astype(float))
+                    similarity = 1.0 - (np.mean(diff) / 255.0)
+                    if similarity > best_similarity:
+                        best_similarity = similarity
+                    if similarity > threshold:
+                        return True, similarity
+    return False, best_similarity
+
+def benchmark_template_matchers(frames, template_path, threshold=0.80):
+    template = Image.open(template_path)
+    gray_template = template.convert('L')
+    results = []
+    for frame in frames:
+        start = time.perf_counter()
+        found, similarity = match_template_legacy(np.array(frame.convert(template.mode)), template, threshold)
+        legacy_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        gray = np.asarray(frame.convert('L'), dtype=np.float64)
+        best = None
+        for scale in TEMPLATE_SCALES:
+            size = (int(gray_template.width * scale), int(gray_template.height * scale))
+            if size[0] > gray.shape[1] or size[1] > gray.shape[0] or min(size) < 10:
+                continue
+            scores = match_template_ncc(gray, np.asarray(gray_template.resize(size, Image.LANCZOS), dtype=np.float64))
+            if scores is None:
+                continue
+            x, y, score = best_match(scores)
+            if best is None or score > best[3]:
+                best = (x, y, scale, score)
+        ncc_time = time.perf_counter() - start
+        results.append((legacy_time, found, similarity, ncc_time, best))
+    return results
+
+class DetectionTimeout(Exception):
+    pass
+
+_WORKER_OCR_ENGINE = None
+
+def _ocr_worker_init(preferred, lang, psm, timeout):
+    global _WORKER_OCR_ENGINE
+    _WORKER_OCR_ENGINE = OCREngine(preferred, lang, psm)
+    for engine in _WORKER_OCR_ENGINE.engines:
+        if hasattr(engine, 'timeout'):
+            engine.timeout = timeout
+    try:
+        _WORKER_OCR_ENGINE.engines[0].warm_up()
+    except Exception:
+        pass
+
+def _ocr_worker_job(size, data):
+    image = Image.frombytes('L', size, data)
+    return _WORKER_OCR_ENGINE.recognize(image)
+
+FrameSlot = namedtuple('FrameSlot', ['index', 'name', 'shape', 'dtype'])
+
+class FrameRing:
+    def __init__(self, slots=4, timeout=5.0):
+        self.cond = threading.Condition()
+        self.timeout = timeout
+        self.buffers = [None] * slots
+        self.refcounts = [0] * slots
+        self.next_index = 0
+        self.writes = 0
+        self.bytes_written = 0
+        self.allocations = 0
+        self.waits = 0
+
+    def acquire(self, array):
+        array = np.ascontiguousarray(array)
+        deadline = time.monotonic() + self.timeout
+        with self.cond:
+            while True:
+                free = [i for i in range(len(self.buffers)) if self.refcounts[i] == 0]
+                if free:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise DetectionTimeout("no free shared frame slot")
+                self.waits += 1
+                self.cond.wait(remaining)
+            index = min(free, key=lambda i: (i - self.next_index) % len(self.buffers))
+            self.next_index = (index + 1) % len(self.buffers)
+            buffer = self.buffers[index]
+            if buffer is None or buffer.size < array.nbytes:
+                # Only reallocated while unreferenced, so no worker is reading it
+                if buffer is not None:
+                    self._destroy(buffer)
+                buffer = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+                self.buffers[index] = buffer
+                self.allocations += 1
+            self.refcounts[index] = 1
+            self.writes += 1
+            self.bytes_written += array.nbytes
+        # The slot is ours until released, so the copy can run outside the lock
+        np.ndarray(array.shape, dtype=array.dtype, buffer=buffer.buf)[...] = array
+        return FrameSlot(index, buffer.name, array.shape, array.dtype.str)
+
+    def retain(self, slot):
+        with self.cond:
+            self.refcounts[slot.index] += 1
+
+    def release(self, slot):
+        with self.cond:
+            self.refcounts[slot.index] = max(0, self.refcounts[slot.index] - 1)
+            self.cond.notify_all()
+
+    def _destroy(self, buffer):
+        try:
+            buffer.close()
+            buffer.unlink()
+        except Exception:
+            pass
+
+    def close(self):
+        with self.cond:
+            buffers, self.buffers = self.buffers, [None] * len(self.buffers)
+            self.refcounts = [0] * len(self.buffers)
+        for buffer in buffers:
+            if buffer is not None:
+                self._destroy(buffer)
+
+    def summary(self):
+        with self.cond:
+            return (f"{self.writes} frames shared ({self.bytes_written / 1048576:.1f}MB), "
+                    f"{self.allocations} slot allocations, {self.waits} waits for a free slot")
+
+_WORKER_FRAMES = OrderedDict()
+_WORKER_TEMPLATES = None
+
+def _attach_frame(slot):
+    buffer = _WORKER_FRAMES.get(slot.name)
+    if buffer is None:
+        buffer = shared_memory.SharedMemory(name=slot.name)
+        _WORKER_FRAMES[slot.name] = buffer
+        # Reallocated slots get new names; drop attachments nobody can reference
+        while len(_WORKER_FRAMES) > 8:
+            _, stale = _WORKER_FRAMES.popitem(last=False)
+            try:
+                stale.close()
+            except Exception:
+                pass
+    else:
+        _WORKER_FRAMES.move_to_end(slot.name)
+    return np.ndarray(slot.shape, dtype=np.dtype(slot.dtype), buffer=buffer.buf)
+
+def _ocr_worker_batch(slot, ranges):
+    # stack_rows copies the tiles out, so nothing references the slot afterwards
+    return recognize_stacked(_attach_frame(slot), ranges, _WORKER_OCR_ENGINE.recognize_lines)
+
+def _template_worker_job(slot, paths, depth, top_k, threshold):
+    global _WORKER_TEMPLATES
+    if _WORKER_TEMPLATES is None:
+        _WORKER_TEMPLATES = (TemplateLibrary(), ParallelMatcher(1))
+    library, matcher = _WORKER_TEMPLATES
+    library.sync(paths)
+    frame = _attach_frame(slot).astype(np.float64)
+    templates = library.entries(frame.shape[0], frame.shape[1])
+    if not templates:
+        return None, []
+    return matcher.search(FramePrep(frame, depth), templates, top_k, threshold)
+
+class DetectionProcessPool:
+    def __init__(self, workers=1, deadline=10.0):
+        self.enabled = True
+        self.workers = workers
+        self.deadline = deadline
+        self.preferred = "auto"
+        self.psm = 4
+        self.lock = threading.Lock()
+        self.executor = None
+        self.pending = 0
+        self.max_pending = 0
+        self.jobs = 0
+        self.timeouts = 0
+        self.total_latency = 0.0
+        self.ring = FrameRing()
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is not None and getattr(self.executor, '_broken', False):
+                self.executor.shutdown(wait=False, cancel_futures=True)
+                self.executor = None
+            if self.executor is None:
+                # spawn keeps the Tk interpreter and our threads out of the workers
+                context = multiprocessing.get_context('spawn')
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=context, initializer=_ocr_worker_init,
+                    initargs=(self.preferred, 'eng', self.psm, max(1, int(self.deadline))))
+            return self.executor
+
+    def recycle(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is None:
+            return
+        processes = list(getattr(executor, '_processes', {}).values())
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            try:
+                process.terminate()
+            except Exception:
+                pass
+
+    def _job_done(self, future):
+        with self.lock:
+            self.pending -= 1
+
+    def submit(self, fn, *args, slot=None):
+        executor = self.get_executor()
+        with self.lock:
+            self.pending += 1
+            self.max_pending = max(self.max_pending, self.pending)
+        if slot is not None:
+            self.ring.retain(slot)
+        try:
+            future = executor.submit(fn, *args)
+        except Exception as e:
+            with self.lock:
+                self.pending -= 1
+            if slot is not None:
+                self.ring.release(slot)
+            if isinstance(e, (BrokenProcessPool, RuntimeError)):
+                # The pool broke or was recycled under us; the job never ran
+                raise DetectionTimeout(f"Detection pool unavailable ({type(e).__name__})") from e
+            raise
+        future.add_done_callback(self._job_done)
+        if slot is not None:
+            # Released when the worker is done, even if the caller gave up waiting
+            future.add_done_callback(lambda _: self.ring.release(slot))
+        return future
+
+    def wait(self, future):
+        start = time.perf_counter()
+        try:
+            result = future.result(timeout=self.deadline)
+        except FutureTimeoutError:
+            future.cancel()
+            with self.lock:
+                self.timeouts += 1
+            # A worker stuck past its deadline is unusable; start a fresh pool
+            self.recycle()
+            raise DetectionTimeout(f"Detection job exceeded {self.deadline:.1f}s deadline")
+        except (BrokenProcessPool, CancelledError) as e:
+            # Killed by another job's recycle or a crashed worker: the frame was never
+            # checked, so report it as unknown rather than clean
+            raise DetectionTimeout(f"Detection job lost with its worker pool ({type(e).__name__})")
+        with self.lock:
+            self.jobs += 1
+            self.total_latency += time.perf_counter() - start
+        return result
+
+    def recognize(self, image):
+        image = image.convert('L')
+        return self.wait(self.submit(_ocr_worker_job, image.size, image.tobytes()))
+
+    def share(self, array):
+        return self.ring.acquire(array)
+
+    def release(self, slot):
+        self.ring.release(slot)
+
+    def recognize_batch(self, slot, ranges):
+        return self.wait(self.submit(_ocr_worker_batch, slot, ranges, slot=slot))
+
+    def match_templates(self, frame, paths, depth, top_k, threshold):
+        slot = self.share(frame)
+        try:
+            future = self.submit(_template_worker_job, slot, paths, depth, top_k, threshold, slot=slot)
+        finally:
+            self.release(slot)
+        return self.wait(future)
+
+    def warm_up(self):
+        start = time.perf_counter()
+        try:
+            self.recognize(Image.new('L', (64, 16), 255))
+            app_log(f"OCR process pool ready ({(time.perf_counter() - start) * 1000:.0f}ms warm-up)", "info")
+        except Exception as e:
+            app_log(f"OCR process pool warm-up failed: {e}", "warning")
+
+    def queue_depth(self):
+        with self.lock:
+            return self.pending
+
+    def shutdown(self):
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self.ring.close()
+
+    def summary(self):
+        with self.lock:
+            avg = (self.total_latency / self.jobs * 1000) if self.jobs else 0.0
+            return (f"{self.workers} process(es), {self.jobs} jobs, avg {avg:.0f}ms, "
+                    f"{self.timeouts} timeouts, queue depth {self.pending} (max {self.max_pending})")
+
+def benchmark_ocr_engines(engines, frames, repeat=3):
+    results = []
+    for engine in engines:
+        timings = []
+        try:
+            engine.warm_up()
+            for _ in range(repeat):
+                for frame in frames:
+                    start = time.perf_counter()
+                    engine.recognize(frame)
+                    timings.append(time.perf_counter() - start)
+        except Exception as e:
+            results.append((engine.name, None, None, str(e)))
+            continue
+        results.append((engine.name, sum(timings) / len(timings), min(timings), None))
+    return results
+
 class FloatingControlPanel:
     def __init__(self, parent_gui, root):
         self.parent_gui = parent_gui
@@ -292,6 +2481,12 @@ class FloatingControlPanel:
                                         fg=COLORS['danger'])
         self.status_indicator.pack(anchor='w', pady=(2, 0))
 
+        self.monitor_label = tk.Label(status_frame, text="Monitor: idle",
+                                      font=('Segoe UI', 8),
+                                      bg=COLORS['surface'],
+                                      fg=COLORS['text_dim'])
+        self.monitor_label.pack(anchor='w', pady=(2, 0))
+
         btn_frame = tk.Frame(main_frame, bg=COLORS['surface'])
         btn_frame.pack(pady=(5, 15))
 
@@ -349,6 +2544,19 @@ class FloatingControlPanel:
         self.log_text.pack(side='left', fill='both', expand=True)
         log_scrollbar.pack(side='right', fill='y')
 
+        self.refresh_monitor_status()
+
+    def refresh_monitor_status(self):
+        try:
+            if not self.monitor_label.winfo_exists():
+                return
+            monitor = getattr(self.parent_gui, 'antibot_monitor', None)
+            if monitor is not None:
+                self.monitor_label.config(text=monitor.status_text())
+            self.root.after(500, self.refresh_monitor_status)
+        except:
+            pass
+
     def open_settings(self):
         if self.settings_window and self.settings_window.root.winfo_exists():
             self.settings_window.root.lift()
@@ -572,6 +2780,26 @@ class SettingsWindow:
                                    resolution=0.1,
                                    value_format=lambda x: f"{int(x * 1000)}ms")
 
+        diag_frame = self.create_themed_frame(scrollable_frame, 'section')
+        diag_frame.pack(fill='x', pady=(0, 15), padx=0)
+
+        tk.Label(diag_frame, text="Diagnostics",
+                font=('Segoe UI', 10, 'bold'),
+                bg=COLORS['surface'], fg=COLORS['text']).pack(anchor='w', padx=15, pady=(10, 5))
+
+        diag_buttons = tk.Frame(diag_frame, bg=COLORS['surface'])
+        diag_buttons.pack(fill='x', padx=15, pady=(0, 10))
+
+        ModernButton(diag_buttons, "Benchmark OCR",
+                     self.parent_gui.benchmark_ocr, COLORS['primary'],
+                     width=140, height=32).pack(side='left', padx=(0, 10))
+        ModernButton(diag_buttons, "Benchmark Matcher",
+                     self.parent_gui.benchmark_matcher, COLORS['primary'],
+                     width=160, height=32).pack(side='left', padx=(0, 10))
+        ModernButton(diag_buttons, "Benchmark Config",
+                     self.parent_gui.benchmark_config, COLORS['primary'],
+                     width=150, height=32).pack(side='left', padx=(0, 10))
+
     def create_cooldown_control(self, parent, label_text, variable, min_val, max_val,
                                resolution=0.5, value_format=None):
         frame = self.create_themed_frame(parent, 'surface')
@@ -638,6 +2866,36 @@ class MacroGUI:
         self.screenshot_lock = threading.Lock()
         self.screenshot_dir = os.path.join(os.path.dirname(__file__), "screenshots")
         os.makedirs(self.screenshot_dir, exist_ok=True)
+        self.screen_capture = ScreenCapture(self.screenshot_dir)
+        self.window_tracker = WindowRegionTracker()
+        self.region_capture = True
+        self.chat_region = None
+        self.frame_gate = FrameChangeGate()
+        self.verdict_cache = VerdictCache()
+        self.color_prefilter = ColorPrefilter()
+        self.antibot_monitor = AntibotMonitor(self)
+        self.ocr_engine = OCREngine()
+        self.detection_pool = DetectionProcessPool()
+        self.ocr_preprocessor = OCRPreprocessor()
+        self.incremental_ocr = IncrementalOCR()
+        self.tile_cache = TileOCRCache()
+        self.phrase_matcher = ANTIBOT_MATCHER
+        self.extra_antibot_phrases = []
+        self.fuzzy_matching = True
+        self.image_match_threshold = 0.80
+        self.pyramid_depth = 2
+        self.pyramid_top_k = 5
+        self.search_stats = SearchStats()
+        self.template_library = TemplateLibrary()
+        self.template_dir = os.path.join(os.path.dirname(__file__), "templates")
+        self.template_hits = {}
+        self.hit_prior = HitPrior()
+        self.parallel_matcher = ParallelMatcher(min(4, os.cpu_count() or 1))
+        self.template_process_pool = False
+        self.detection_mode = "auto"
+        self.race_lock = threading.Lock()
+        self.race_executor = None
+        self.race_stats = {'races': 0, 'total_time': 0.0, 'ocr': 0, 'image': 0}
 
         self.owobuy_cooldown = tk.DoubleVar(root, value=5.0)
         self.owo_enabled = tk.BooleanVar(root, value=True)
@@ -652,10 +2910,13 @@ class MacroGUI:
         self.random_enabled = tk.BooleanVar(root, value=True)
         self.owobuy_enabled = tk.BooleanVar(root, value=True)
         self.window_name = tk.StringVar(root, value="Discord")
+        self.config_snapshot = None
 
         self.running = False
         self.paused = False
         self.pause_lock = threading.RLock()
+        self.state_cond = threading.Condition(self.pause_lock)
+        self.state_wakeups = 0
 
         self.start_lock = threading.Lock()
         self.countdown_thread = None
@@ -682,7 +2943,12 @@ class MacroGUI:
             'antibot_detections': 0
         }
 
+        self.publish_config()
+        for name in ConfigSnapshot.__slots__:
+            getattr(self, name).trace_add('write', self.publish_config)
+
         self.load_settings()
+        self.reload_templates()
         self.control_panel = FloatingControlPanel(self, root)
 
         global _APP_INSTANCE
@@ -711,10 +2977,13 @@ class MacroGUI:
             self.log(f"PyAutoGUI initialization warning: {e}", "warning")
 
         if OCR_AVAILABLE:
-            self.log("OCR antibot detection enabled", "success")
+            self.log(f"OCR antibot detection enabled ({self.ocr_engine.active_name()}, mode: {self.detection_mode})", "success")
+            warm_up = self.detection_pool.warm_up if self.detection_pool.enabled else self.ocr_engine.warm_up
+            threading.Thread(target=warm_up, name="ocr-warmup", daemon=True).start()
         else:
             self.log("OCR not available - using image matching fallback", "warning")
         
+        self.log(f"Screen capture backends: {', '.join(b.name for b in self.screen_capture.backends)}", "info")
         self.log(f"Screenshots will be saved to: {self.screenshot_dir}", "info")
 
     def log(self, message, level="info"):
@@ -734,35 +3003,120 @@ class MacroGUI:
         )
         if filename:
             self.image_path = filename
+            self.reload_templates()
             self.log(f"Image selected: {os.path.basename(filename)}", "success")
             if callback:
                 callback()
 
+    def benchmark_ocr(self):
+        if not OCR_AVAILABLE:
+            self.log("OCR benchmark skipped: no OCR engine installed", "warning")
+            return
+
+        def run():
+            frames = []
+            for _ in range(3):
+                frame = self.capture_detection_frame()
+                if frame is not None:
+                    frames.append(frame.convert('L'))
+            if not frames:
+                self.log("OCR benchmark skipped: could not capture frames", "warning")
+                return
+            self.log(f"Benchmarking OCR engines on {len(frames)} frames...", "info")
+            engines = [PytesseractEngine()] if PYTESSERACT_AVAILABLE else []
+            if TESSEROCR_AVAILABLE:
+                engines.insert(0, TesserocrEngine())
+            for name, avg, best, error in benchmark_ocr_engines(engines, frames):
+                if error:
+                    self.log(f"[bench] {name}: failed ({error})", "warning")
+                else:
+                    self.log(f"[bench] {name}: avg {avg * 1000:.0f}ms, best {best * 1000:.0f}ms", "info")
+            for engine in engines:
+                engine.close()
+
+        threading.Thread(target=run, name="ocr-benchmark", daemon=True).start()
+
+    def publish_config(self, *args):
+        try:
+            values = {name: getattr(self, name).get() for name in ConfigSnapshot.__slots__}
+        except (tk.TclError, ValueError):
+            # A half-typed entry; keep serving the last valid snapshot
+            return
+        # A single attribute store, so readers see either the old or the new snapshot
+        self.config_snapshot = ConfigSnapshot(**values)
+
+    def benchmark_config(self):
+        def run():
+            reads = 2000
+            variable = self.typing_delay_min
+            start = time.perf_counter()
+            for _ in range(reads):
+                variable.get()
+            tk_cost = (time.perf_counter() - start) / reads
+            start = time.perf_counter()
+            for _ in range(reads):
+                self.config_snapshot.typing_delay_min
+            snapshot_cost = (time.perf_counter() - start) / reads
+            self.log(f"[bench] config read from worker thread: Tk variable {tk_cost * 1e6:.1f}us, "
+                     f"snapshot {snapshot_cost * 1e6:.2f}us ({tk_cost / max(snapshot_cost, 1e-9):.0f}x)", "info")
+
+        threading.Thread(target=run, name="config-benchmark", daemon=True).start()
+
+    def reload_templates(self):
+        paths = self.template_library.scan(self.template_dir)
+        if self.image_path and os.path.exists(self.image_path) and self.image_path not in paths:
+            paths.insert(0, self.image_path)
+        count = self.template_library.sync(paths)
+        self.log(f"Template library: {count} template(s) loaded", "info")
+        return count
+
+    def benchmark_matcher(self):
+        if not self.image_path or not os.path.exists(self.image_path):
+            self.log("Matcher benchmark skipped: no template image selected", "warning")
+            return
+
+        def run():
+            frames = [f for f in (self.capture_detection_frame() for _ in range(3)) if f is not None]
+            if not frames:
+                self.log("Matcher benchmark skipped: could not capture frames", "warning")
+                return
+            self.log(f"Benchmarking template matchers on {len(frames)} frames...", "info")
+            results = benchmark_template_matchers(frames, self.image_path, self.image_match_threshold)
+            for i, (legacy_time, found, similarity, ncc_time, best) in enumerate(results, 1):
+                ncc_text = f"({best[0]}, {best[1]}) x{best[2]:.1f} score {best[3]:.2f}" if best else "no match"
+                self.log(f"[bench] frame {i}: legacy {legacy_time * 1000:.0f}ms "
+                         f"(found={found}, sim {similarity:.2f}) | NCC {ncc_time * 1000:.0f}ms {ncc_text}", "info")
+
+        threading.Thread(target=run, name="matcher-benchmark", daemon=True).start()
+
     def pause_macro(self):
         if not self.running:
             return
-        with self.pause_lock:
+        with self.state_cond:
             self.paused = not self.paused
+            self.state_cond.notify_all()
             if self.paused:
                 self.control_panel.update_status("Paused", COLORS['warning'])
                 self.log("Macro paused", "warning")
             else:
+                self.verdict_cache.invalidate()
+                self.antibot_monitor.clear()
                 def resume_countdown():
                     self.control_panel.update_status("Resuming in 3 seconds...", COLORS['warning'])
                     self.log("Resuming in 3 seconds...", "warning")
                     for i in range(3, 0, -1):
-                        if not self.running:
+                        if not self.running or self.paused:
                             return
                         self.log(f"{i}...", "warning")
-                        time.sleep(1)
-                    if self.running:
+                        self.sleep_unless_stopped(1, wake_on_pause=True)
+                    if self.running and not self.paused:
                         self.control_panel.update_status("Running", COLORS['success'])
                         self.log("Macro resumed", "success")
                 # Start countdown in separate thread to prevent GUI freezing
                 threading.Thread(target=resume_countdown, daemon=True).start()
 
     def start_macro(self):
-        if not self.image_path or not os.path.exists(self.image_path):
+        if not self.reload_templates():
             messagebox.showerror("Error", "Please select a valid image!")
             return
         if not self.start_lock.acquire(blocking=False):
@@ -774,11 +3128,20 @@ class MacroGUI:
                 return
             if self.countdown_thread and self.countdown_thread.is_alive():
                 self.log("Waiting for previous countdown to finish...", "warning")
-                self.stop_event.set()
+                self.signal_stop()
                 self.countdown_thread.join(timeout=5)
-            self.running = True
-            self.paused = False
-            self.stop_event.clear()
+            with self.state_cond:
+                self.running = True
+                self.paused = False
+                # A fresh event per run: threads of a stopped run keep their set one
+                # and wind down instead of being revived by this start
+                self.stop_event = threading.Event()
+                self.state_cond.notify_all()
+            self.state_wakeups = 0
+            self.window_tracker.invalidate()
+            self.frame_gate.reset()
+            self.verdict_cache.invalidate()
+            self.incremental_ocr.reset()
             self.stats['start_time'] = time.time()
             self.control_panel.start_btn.set_enabled(False)
             self.control_panel.pause_btn.set_enabled(True)
@@ -786,42 +3149,39 @@ class MacroGUI:
             self.control_panel.update_status("Running", COLORS['success'])
             self.log("Macro started - Multithreaded mode active", "success")
             self.save_settings()
-            self.countdown_thread = threading.Thread(target=self.start_with_countdown, daemon=True)
+            self.countdown_thread = threading.Thread(target=self.start_with_countdown, args=(self.stop_event,),
+                                                     daemon=True)
             self.countdown_thread.start()
         finally:
             self.start_lock.release()
 
-    def start_with_countdown(self):
+    def start_with_countdown(self, stop_event):
         self.log("Starting in 3 seconds... Click into Discord window!", "warning")
         for i in range(3, 0, -1):
-            if not self.running or self.stop_event.is_set():
+            if not self.running or stop_event.is_set():
                 self.log("Countdown cancelled", "warning")
                 return
             self.log(f"{i}...", "warning")
-            time.sleep(1)
-        if not self.running or self.stop_event.is_set():
+            self.sleep_unless_stopped(1, stop_event=stop_event)
+        if not self.running or stop_event.is_set():
             self.log("Start cancelled after countdown", "warning")
             return
         for thread in self.threads:
             if thread.is_alive():
                 self.log("Warning: Old thread still running, waiting...", "warning")
-        self.threads = []
-        if self.owo_enabled.get():
-            self.threads.append(threading.Thread(target=self.owo_loop, name="owo-thread", daemon=True))
-        self.threads.append(threading.Thread(target=self.owoh_owob_loop, name="owoh-owob-thread", daemon=True))
-        if self.owobuy_enabled.get():
-            self.threads.insert(0, threading.Thread(target=self.owobuy_loop, name="owobuy-thread", daemon=True))
-        if not self.running or self.stop_event.is_set():
+        self.threads = [threading.Thread(target=self.dispatch_loop, args=(stop_event,),
+                                         name="dispatcher", daemon=True)]
+        if not self.running or stop_event.is_set():
             self.log("Start cancelled before thread launch", "warning")
             return
         for thread in self.threads:
             thread.start()
+        self.antibot_monitor.start()
         self.log("All command threads started", "success")
 
     def stop_macro(self):
-        self.running = False
-        self.stop_event.set()
-        self.paused = False
+        self.signal_stop()
+        self.antibot_monitor.stop()
         try:
             # Clean up screenshots in local directory
             for pattern in ['macro_screenshot_*', 'antibot_ss.png']:
@@ -842,6 +3202,33 @@ class MacroGUI:
         self.control_panel.update_status("Stopped", COLORS['danger'])
         self.stats['start_time'] = None
         self.threads = []
+        self.log(f"Capture stats - {self.screen_capture.summary()}", "info")
+        self.log(f"Frame gate - {self.frame_gate.summary()}", "info")
+        if self.color_prefilter.active():
+            self.log(f"Color pre-filter - {self.color_prefilter.summary()}", "info")
+        self.log(f"Verdict cache - {self.verdict_cache.summary(self.stats['commands_sent'])}", "info")
+        if OCR_AVAILABLE:
+            if self.detection_pool.enabled:
+                self.log(f"OCR process pool - {self.detection_pool.summary()}", "info")
+            else:
+                self.log(f"OCR engines - {self.ocr_engine.summary()}", "info")
+            self.log(f"OCR preprocessing - {self.ocr_preprocessor.summary()}", "info")
+            self.log(f"Incremental OCR - {self.incremental_ocr.summary()}", "info")
+            self.log(f"Tile cache - {self.tile_cache.summary()}", "info")
+        if len(self.template_library):
+            self.log(f"Template search - {self.search_stats.summary()}", "info")
+            if self.template_hits:
+                hits = ", ".join(f"{name}: {count}" for name, count in self.template_hits.items())
+                self.log(f"Template hits - {hits}", "info")
+            self.log(f"Hit prior - {self.hit_prior.summary()}", "info")
+            self.log(f"Matcher pool - {self.parallel_matcher.summary()}", "info")
+        if self.detection_pool.ring.writes:
+            self.log(f"Shared frames - {self.detection_pool.ring.summary()}", "info")
+        if self.detection_mode == "race":
+            self.log(f"Detector race - {self.race_summary()}", "info")
+        self.log(f"State wait wakeups: {self.state_wakeups}", "info")
+        self.log(f"Dispatch lateness - {self.scheduler.lateness_summary()}", "info")
+        self.log(f"Input - {self.scheduler.input.summary()}", "info")
         self.log("Macro stopped (threads exiting in background)", "error")
         self.save_settings()
 
@@ -849,163 +3236,306 @@ class MacroGUI:
         try:
             cmd = ["xdotool", "getactivewindow", "getwindowname"]
             window_name = subprocess.check_output(cmd, stderr=subprocess.DEVNULL).decode().strip()
-            target = self.window_name.get().lower().strip()
+            target = self.config_snapshot.window_name.lower().strip()
             if not target:
                 return True
             return target in window_name.lower()
         except Exception:
             return True
 
-    def capture_screenshot(self, max_total_wait=10.0, retry_delay=0.5):
+    def get_capture_region(self):
+        if not self.region_capture:
+            return None
+        geometry = self.window_tracker.get(self.config_snapshot.window_name)
+        if geometry is None:
+            return None
+        x, y, w, h = geometry
+        if self.chat_region:
+            left, top, right, bottom = self.chat_region
+            x, y, w, h = (x + int(w * left), y + int(h * top),
+                          max(1, int(w * (right - left))), max(1, int(h * (bottom - top))))
+        try:
+            # None (window fully off-screen) falls back to a full-frame capture
+            return self.screen_capture.clamp((x, y, w, h))
+        except Exception as e:
+            self.log(f"Could not clamp capture region: {e}", "warning")
+            return None
+
+    def capture_detection_frame(self):
+        return self.capture_screenshot(region=self.get_capture_region())
+
+    def capture_screenshot(self, max_total_wait=10.0, retry_delay=0.5, region=None):
         with self.screenshot_lock:
             start_time = time.time()
-    
+
             while time.time() - start_time < max_total_wait:
                 try:
-                    prefix = f"temp_screenshot_{int(time.time())}"
-                    base_path = os.path.join(self.screenshot_dir, prefix + ".png")
-                    pattern = os.path.join(self.screenshot_dir, prefix + "*.png")
-    
-                    subprocess.run(
-                        ["scrot", base_path],
-                        stdout=subprocess.DEVNULL,
-                        stderr=subprocess.DEVNULL,
-                        timeout=2,
-                    )
-    
-                    matches = glob.glob(pattern)
-                    if matches:
-                        latest = max(matches, key=os.path.getmtime)
-    
-                        img = Image.open(latest)
-                        img_copy = img.copy()
-                        img.close()
-    
-                        # Cleanup — race-safe
-                        for f in matches:
-                            try:
-                                os.remove(f)
-                            except FileNotFoundError:
-                                pass
-                            except Exception as e:
-                                self.log(f"Screenshot cleanup warning: {e}", "warning")
-    
-                        return img_copy
-    
+                    img = self.screen_capture.grab(region)
+                    if img is not None:
+                        return img
                 except Exception:
                     pass
-                
+
                 time.sleep(retry_delay)
-    
+
             self.log(
                 f"Screenshot unavailable after {max_total_wait}s, will retry later.",
                 "warning",
             )
             return None
 
-
     def detect_antibot(self):
-        use_ocr = OCR_AVAILABLE
-        if use_ocr:
-            return self.detect_antibot_ocr()
-        else:
-            return self.detect_antibot_image()
+        return self.verdict_cache.get(self._detect_antibot_uncached)
 
-    def detect_antibot_ocr(self):
+    def _detect_antibot_uncached(self):
+        screenshot = self.capture_detection_frame()
+        if screenshot is None:
+            return False
+        try:
+            signature, changed, verdict = self.frame_gate.check(screenshot)
+        except Exception as e:
+            self.log(f"Frame gate error: {e}", "warning")
+            signature, changed, verdict = None, True, None
+        if not changed:
+            return verdict
+        regions = [screenshot]
+        if self.color_prefilter.active():
+            try:
+                boxes = self.color_prefilter.find(screenshot)
+                regions = [screenshot.crop(box) for box in boxes]
+            except Exception as e:
+                self.log(f"Color pre-filter error: {e}", "warning")
+        verdict = False
+        for region in regions:
+            # Only the whole pane is tracked incrementally; candidate crops vary
+            verdict = self.run_detectors(region, incremental=region is screenshot)
+            if verdict is not False:
+                break
+        if signature is not None:
+            self.frame_gate.commit(signature, verdict)
+        return verdict
+
+    def run_detectors(self, frame, incremental=True):
+        mode = self.detection_mode
+        if mode == "race" and OCR_AVAILABLE and len(self.template_library):
+            return self.race_detectors(frame, incremental)
+        if mode == "image" or not OCR_AVAILABLE:
+            return self.detect_antibot_image(frame)
+        return self.detect_antibot_ocr(frame, incremental)
+
+    def race_detectors(self, frame, incremental=True):
+        start = time.perf_counter()
+        race = DetectionRace()
+        with self.race_lock:
+            if self.race_executor is None:
+                # A third worker absorbs an abandoned OCR call from the previous race
+                self.race_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="detector")
+            executor = self.race_executor
+        futures = {
+            executor.submit(self.detect_antibot_ocr, frame, incremental, race): "ocr",
+            executor.submit(self.detect_antibot_image, frame, race): "image",
+        }
+        winner = None
+        unknown = False
+        for future in as_completed(futures):
+            try:
+                verdict = future.result()
+            except Exception as e:
+                self.log(f"[race] {futures[future]} detector error: {e}", "error")
+                continue
+            if verdict is None:
+                unknown = True
+                continue
+            if verdict:
+                winner = futures[future]
+                # OCR cannot be interrupted mid-call; the loser's claim_race fails
+                # so it neither counts nor logs the same prompt again
+                race.cancel.set()
+                for other in futures:
+                    other.cancel()
+                break
+        elapsed = time.perf_counter() - start
+        with self.race_lock:
+            self.race_stats['races'] += 1
+            self.race_stats['total_time'] += elapsed
+            if winner:
+                self.race_stats[winner] += 1
+        if winner is None and unknown:
+            return None
+        return winner is not None
+
+    def claim_race(self, race, detector):
+        if race is None:
+            return True
+        with self.race_lock:
+            if race.winner is not None:
+                return False
+            race.winner = detector
+        race.cancel.set()
+        return True
+
+    def race_summary(self):
+        with self.race_lock:
+            stats = self.race_stats
+            avg = (stats['total_time'] / stats['races'] * 1000) if stats['races'] else 0.0
+            return (f"{stats['races']} races, avg {avg:.0f}ms, "
+                    f"positives won by OCR {stats['ocr']}, by image {stats['image']}")
+
+    def recognize_tiles(self, image):
+        if self.detection_pool.enabled:
+            pool = self.detection_pool
+            # Written once to shared memory; workers get row ranges of the slot
+            slot = pool.share(np.asarray(image.convert('L')))
+            try:
+                return self.tile_cache.recognize(image, lambda pixels, ranges: pool.recognize_batch(slot, ranges))
+            finally:
+                pool.release(slot)
+        return self.tile_cache.recognize(
+            image, lambda pixels, ranges: recognize_stacked(pixels, ranges, self.ocr_engine.recognize_lines))
+
+    def detect_antibot_ocr(self, screenshot=None, incremental=True, race=None):
         try:
-            screenshot = self.capture_screenshot()
+            if screenshot is None:
+                screenshot = self.capture_detection_frame()
             if screenshot is None:
                 return False
             
-            screenshot_gray = screenshot.convert('L')
-            text = pytesseract.image_to_string(screenshot_gray, lang='eng')
-            text_normalized = re.sub(r'\s+', ' ', text.lower().strip())
-            
-            antibot_patterns = [
-                r'\bare\s+you\s+a\s+real\s+human\b',
-                r'\bplease\s+use\s+the\s+link\s+below\b',
-                r'\bplease\s+complete\s+this\s+within\s+10\s+minutes\b',
-                r'https?://owobot\.com/captcha',
-                r'\bplease\s+complete\s+your\s+captcha\s+to\s+verify\b'
-            ]
-            
-            found = False
-            matched_pattern = None
-            for pattern in antibot_patterns:
-                if re.search(pattern, text_normalized):
-                    found = True
-                    matched_pattern = pattern
-                    break
-            
-            if found:
+            if self.ocr_preprocessor.enabled:
+                ocr_input = self.ocr_preprocessor.process(screenshot)
+            else:
+                ocr_input = screenshot.convert('L')
+            start = time.perf_counter()
+            if incremental:
+                text = self.incremental_ocr.run(ocr_input, self.recognize_tiles)
+            else:
+                text = self.recognize_tiles(ocr_input)
+            self.ocr_preprocessor.record_ocr_time(time.perf_counter() - start)
+            match = self.phrase_matcher.search(text, fuzzy=self.fuzzy_matching)
+
+            if match is not None:
+                if not self.claim_race(race, "ocr"):
+                    return False
                 self.stats['antibot_detections'] += 1
                 self.lifetime_stats['antibot_detections'] += 1
-                self.log(f"⚠ Anti-bot detected (OCR found: '{matched_pattern}')! Pausing macro.", "warning")
+                detail = f" ~{match.distance} edits" if match.distance else ""
+                self.log(f"⚠ Anti-bot detected (OCR found: '{match.phrase}' at {match.start}{detail})! Pausing macro.", "warning")
                 return True
             return False
+        except DetectionTimeout as e:
+            # Unknown verdict: callers keep the macro paused until a check succeeds
+            self.log(f"OCR timed out ({e}); treating the frame as unknown.", "warning")
+            return None
         except Exception as e:
             self.log(f"Error in OCR anti-bot detection: {e}", "error")
             traceback.print_exc()
             return False
 
-    def detect_antibot_image(self):
-        if not self.image_path or not os.path.exists(self.image_path):
+    def detect_antibot_image(self, screenshot=None, race=None):
+        if not len(self.template_library):
             return False
         try:
-            screenshot = self.capture_screenshot()
+            if screenshot is None:
+                screenshot = self.capture_detection_frame()
             if screenshot is None:
                 return False
-            
-            template = Image.open(self.image_path)
-            screen_array = np.array(screenshot)
-            template_array = np.array(template)
-            screen_h, screen_w = screen_array.shape[:2]
-            template_h, template_w = template_array.shape[:2]
-            found = False
-            best_similarity = 0
-            
-            for scale in [0.8, 0.9, 1.0, 1.1, 1.2]:
-                new_w = int(template_w * scale)
-                new_h = int(template_h * scale)
-                if new_w > screen_w or new_h > screen_h or new_w < 10 or new_h < 10:
-                    continue
-                resized_template = template.resize((new_w, new_h), Image.LANCZOS)
-                template_resized_array = np.array(resized_template)
-                step = 30
-                margin = 50
-                for y in range(margin, screen_h - new_h - margin, step):
-                    for x in range(margin, screen_w - new_w - margin, step):
-                        region = screen_array[y:y+new_h, x:x+new_w]
-                        if region.shape == template_resized_array.shape:
-                            diff = np.abs(region.astype(float) - template_resized_array.astype(float))
-                            similarity = 1.0 - (np.mean(diff) / 255.0)
-                            if similarity > best_similarity:
-                                best_similarity = similarity
-                            if similarity > 0.80:
-                                found = True
-                                break
-                    if found:
-                        break
-                if found:
-                    break
-            
-            if found:
+
+            frame = np.asarray(screenshot.convert('L'), dtype=np.float64)
+            templates = self.template_library.entries(frame.shape[0], frame.shape[1])
+            if not templates:
+                return False
+
+            best = self.hit_prior.check(frame, templates, self.image_match_threshold)
+            if best is None and self.template_process_pool:
+                best, level_stats = self.detection_pool.match_templates(
+                    np.asarray(screenshot.convert('L')), self.template_library.paths(),
+                    self.pyramid_depth, self.pyramid_top_k, self.image_match_threshold)
+                self.search_stats.record(level_stats)
+                if best is not None and best.score >= self.image_match_threshold:
+                    self.hit_prior.record_full_hit()
+            elif best is None:
+                prep = FramePrep(frame, self.pyramid_depth)
+                best, level_stats = self.parallel_matcher.search(
+                    prep, templates, self.pyramid_top_k, self.image_match_threshold,
+                    race.cancel if race is not None else None)
+                self.search_stats.record(level_stats)
+                if best is not None and best.score >= self.image_match_threshold:
+                    self.hit_prior.record_full_hit()
+
+            if best is not None and best.score >= self.image_match_threshold:
+                if not self.claim_race(race, "image"):
+                    return False
+                self.hit_prior.remember(best)
+                self.template_hits[best.name] = self.template_hits.get(best.name, 0) + 1
                 self.stats['antibot_detections'] += 1
                 self.lifetime_stats['antibot_detections'] += 1
-                self.log("⚠ Anti-bot popup detected! Pausing macro.", "warning")
+                self.log(f"⚠ Anti-bot popup detected ({best.name} at ({best.x}, {best.y}) "
+                         f"scale {best.scale:.1f} score {best.score:.2f})! Pausing macro.", "warning")
                 return True
             return False
+        except DetectionTimeout as e:
+            self.log(f"Template search timed out ({e}); treating the frame as unknown.", "warning")
+            return None
         except Exception as e:
             self.log(f"Error in anti-bot detection: {e}", "error")
             traceback.print_exc()
             return False
 
-    def wait_if_paused(self):
-        with self.pause_lock:
-            return not self.paused
+    def antibot_active(self):
+        if self.antibot_monitor.is_running() and not self.antibot_monitor.is_stale():
+            return self.antibot_monitor.detected.is_set()
+        # None means the check could not complete; treat it like a detection
+        return self.detect_antibot() is not False
 
-    def send_command(self, text, command_type):
-        if not self.running:
+    def pause_for_antibot(self, source, unknown=False):
+        with self.state_cond:
+            if self.paused or not self.running:
+                return
+            self.paused = True
+            self.state_cond.notify_all()
+        if unknown:
+            self.log(f"[{source}] Anti-bot check timed out! Macro paused to be safe.", "warning")
+        else:
+            self.log(f"[{source}] Anti-bot detected! Macro paused.", "warning")
+        try:
+            self.root.after(0, lambda: self.control_panel.update_status("Paused (anti-bot)", COLORS['warning']))
+        except Exception:
+            pass
+
+    def signal_stop(self):
+        with self.state_cond:
+            self.running = False
+            self.paused = False
+            self.stop_event.set()
+            self.state_cond.notify_all()
+
+    def wait_until_resumed(self, stop_event=None):
+        if stop_event is None:
+            stop_event = self.stop_event
+        with self.state_cond:
+            while self.running and self.paused and not stop_event.is_set():
+                self.state_cond.wait()
+                self.state_wakeups += 1
+            return self.running and not stop_event.is_set()
+
+    def sleep_unless_stopped(self, seconds, wake_on_pause=False, stop_event=None):
+        if stop_event is None:
+            stop_event = self.stop_event
+        deadline = time.monotonic() + seconds
+        with self.state_cond:
+            while self.running and not stop_event.is_set():
+                if wake_on_pause and self.paused:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.state_cond.wait(remaining)
+                self.state_wakeups += 1
+            return self.running and not stop_event.is_set()
+
+    def send_command(self, text, command_type, stop_event=None):
+        if stop_event is None:
+            stop_event = self.stop_event
+        if not self.running or stop_event.is_set():
             return False
         with self.pause_lock:
             if self.paused or not self.running:
@@ -1013,10 +3543,8 @@ class MacroGUI:
         if not self.is_correct_window_active():
             self.log(f"[{command_type}] Target window not active; skipping send.", "warning")
             return False
-        if self.detect_antibot():
-            self.log(f"[{command_type}] Anti-bot detected! Pausing macro.", "warning")
-            with self.pause_lock:
-                self.paused = True
+        if self.antibot_active():
+            self.pause_for_antibot(command_type)
             return False
         acquired = send_lock.acquire(timeout=5)
         if not acquired:
@@ -1024,9 +3552,9 @@ class MacroGUI:
             return False
         try:
             with self.pause_lock:
-                if self.paused or not self.running:
+                if self.paused or not self.running or stop_event.is_set():
                     return False
-            if not self.scheduler.wait_for_slot(timeout=10):
+            if not self.scheduler.wait_for_slot(timeout=10, stop_event=stop_event):
                 self.log(f"[{command_type}] Scheduler timeout", "warning")
                 return False
 
@@ -1036,16 +3564,9 @@ class MacroGUI:
             time.sleep(final_pause)
 
             try:
-                if platform.system() == 'Linux':
-                    subprocess.run(['xdotool', 'key', 'Return'], check=True)
-                else:
-                    pyautogui.press('enter')
+                self.scheduler.input.press_enter()
             except Exception as e:
                 self.log(f"[{command_type}] Enter key error: {e}", "error")
-                try:
-                    pyautogui.press('enter')
-                except:
-                    pass
 
             time.sleep(0.2)
 
@@ -1063,125 +3584,68 @@ class MacroGUI:
         finally:
             send_lock.release()
 
-    def owobuy_loop(self):
-        self.log("[owobuy] Thread started", "info")
-        while self.running and not self.stop_event.is_set():
+    def command_jobs(self):
+        def hunt_battle():
+            slash = self.config_snapshot.use_slash_hunt_battle
+            return [("/hunt" if slash else "owoh", "owoh"), ("/battle" if slash else "owob", "owob")]
+        return [
+            CommandJob("owobuy", lambda: [("owo buy 1", "owobuy")], "owobuy_cooldown", "owobuy_enabled"),
+            CommandJob("owo", lambda: [("owo", "owo")], "owo_cooldown", "owo_enabled"),
+            CommandJob("owoh-owob", hunt_battle, "owoh_owob_cooldown", None),
+        ]
+
+    def run_job_step(self, job, step, stop_event, generation):
+        config = self.config_snapshot
+        if job.enabled is not None and not getattr(config, job.enabled):
+            self.scheduler.schedule(job, 0, max(1.0, getattr(config, job.cooldown)), generation)
+            return
+        steps = job.steps()
+        text, command_type = steps[step]
+        if not self.send_command(text, command_type, stop_event):
+            # Restart from the first step so a pair always goes out together
+            self.scheduler.schedule(job, 0, 1.0, generation)
+            return
+        self.log(f"[{job.name}] Sent: {text}", "command")
+        if step + 1 < len(steps):
+            self.scheduler.schedule(job, step + 1, random.uniform(0.8, 1.5), generation)
+            return
+        delay = self.scheduler.humanize_delay(getattr(config, job.cooldown))
+        self.log(f"[{job.name}] Waiting {delay:.2f}s", "info")
+        self.scheduler.schedule(job, 0, delay, generation)
+
+    def dispatch_loop(self, stop_event):
+        self.log("[dispatcher] Thread started", "info")
+        generation = self.scheduler.plan(self.command_jobs())
+        window_warned = False
+        while self.running and not stop_event.is_set():
             try:
-                while self.running and not self.wait_if_paused():
-                    time.sleep(0.1)
-                    if self.stop_event.is_set():
-                        break
-                if not self.running or self.stop_event.is_set():
+                if not self.wait_until_resumed(stop_event):
                     break
-                if not self.is_correct_window_active():
-                    self.log("[owobuy] Target window not active; waiting...", "warning")
-                    while self.running and not self.stop_event.is_set() and not self.is_correct_window_active():
-                        time.sleep(0.5)
-                    continue
-                if self.detect_antibot():
-                    with self.pause_lock:
-                        self.paused = True
-                    time.sleep(1)
-                    continue
-                if self.send_command("owo buy 1", "owobuy"):
-                    self.log("[owobuy] Sent: owo buy 1", "command")
-                else:
-                    time.sleep(1)
-                    continue
-                delay = self.scheduler.humanize_delay(self.owobuy_cooldown.get())
-                self.log(f"[owobuy] Waiting {delay:.2f}s", "info")
-                wait_steps = int(delay * 10)
-                for step in range(wait_steps):
-                    if not self.running or self.stop_event.is_set():
-                        break
-                    time.sleep(0.1)
-            except Exception as e:
-                self.log(f"[owobuy] Error: {str(e)}", "error")
-                time.sleep(1)
-        self.log("[owobuy] Thread stopped", "info")
-
-    def owo_loop(self):
-        self.log("[owo] Thread started", "info")
-        while self.running and not self.stop_event.is_set():
-            try:
-                while self.running and not self.wait_if_paused():
-                    time.sleep(0.1)
-                    if self.stop_event.is_set():
-                        break
-                if not self.running or self.stop_event.is_set():
+                due = self.scheduler.next_due()
+                if due is None:
                     break
-                if not self.is_correct_window_active():
-                    self.log("[owo] Target window not active; waiting...", "warning")
-                    while self.running and not self.stop_event.is_set() and not self.is_correct_window_active():
-                        time.sleep(0.5)
-                    continue
-                if self.detect_antibot():
-                    with self.pause_lock:
-                        self.paused = True
-                    time.sleep(1)
+                remaining = due - time.monotonic()
+                if remaining > 0:
+                    self.sleep_unless_stopped(remaining, wake_on_pause=True, stop_event=stop_event)
                     continue
-                if self.send_command("owo", "owo"):
-                    self.log("[owo] Sent: owo", "command")
-                else:
-                    time.sleep(1)
+                if not self.is_correct_window_active():
+                    if not window_warned:
+                        self.log("[dispatcher] Target window not active; waiting...", "warning")
+                        window_warned = True
+                    self.sleep_unless_stopped(0.5, stop_event=stop_event)
                     continue
-                delay = self.scheduler.humanize_delay(self.owo_cooldown.get())
-                self.log(f"[owo] Waiting {delay:.2f}s", "info")
-                wait_steps = int(delay * 10)
-                for step in range(wait_steps):
-                    if not self.running or self.stop_event.is_set():
-                        break
-                    time.sleep(0.1)
+                window_warned = False
+                job, step = self.scheduler.pop_due()
             except Exception as e:
-                self.log(f"[owo] Error: {str(e)}", "error")
-                time.sleep(1)
-        self.log("[owo] Thread stopped", "info")
-
-    def owoh_owob_loop(self):
-        self.log("[owoh-owob] Thread started", "info")
-        while self.running and not self.stop_event.is_set():
+                self.log(f"[dispatcher] Error: {str(e)}", "error")
+                self.sleep_unless_stopped(1, stop_event=stop_event)
+                continue
             try:
-                while self.running and not self.wait_if_paused():
-                    time.sleep(0.1)
-                    if self.stop_event.is_set():
-                        break
-                if not self.running or self.stop_event.is_set():
-                    break
-                if not self.is_correct_window_active():
-                    self.log("[owoh-owob] Target window not active; waiting...", "warning")
-                    while self.running and not self.stop_event.is_set() and not self.is_correct_window_active():
-                        time.sleep(0.5)
-                    continue
-                if self.detect_antibot():
-                    with self.pause_lock:
-                        self.paused = True
-                    time.sleep(1)
-                    continue
-                cmd1 = "/hunt" if self.use_slash_hunt_battle.get() else "owoh"
-                if self.send_command(cmd1, "owoh"):
-                    self.log(f"[owoh-owob] Sent: {cmd1}", "command")
-                else:
-                    time.sleep(1)
-                    continue
-                pair_gap = random.uniform(0.8, 1.5)
-                time.sleep(pair_gap)
-                cmd2 = "/battle" if self.use_slash_hunt_battle.get() else "owob"
-                if self.send_command(cmd2, "owob"):
-                    self.log(f"[owoh-owob] Sent: {cmd2}", "command")
-                else:
-                    time.sleep(1)
-                    continue
-                delay = self.scheduler.humanize_delay(self.owoh_owob_cooldown.get())
-                self.log(f"[owoh-owob] Waiting {delay:.2f}s", "info")
-                wait_steps = int(delay * 10)
-                for step in range(wait_steps):
-                    if not self.running or self.stop_event.is_set():
-                        break
-                    time.sleep(0.1)
+                self.run_job_step(job, step, stop_event, generation)
             except Exception as e:
-                self.log(f"[owoh-owob] Error: {str(e)}", "error")
-                time.sleep(1)
-        self.log("[owoh-owob] Thread stopped", "info")
+                self.log(f"[{job.name}] Error: {str(e)}", "error")
+                self.scheduler.schedule(job, 0, 1.0, generation)
+        self.log("[dispatcher] Thread stopped", "info")
 
     SETTINGS_FILE = os.path.join(os.path.dirname(__file__), "settings.json")
 
@@ -1203,6 +3667,61 @@ class MacroGUI:
                 self.typing_pause_min.set(float(data.get("typing_pause_min", 0.2)))
                 self.typing_pause_max.set(float(data.get("typing_pause_max", 0.5)))
                 self.window_name.set(str(data.get("window_name", "Discord")))
+                self.region_capture = bool(data.get("region_capture", True))
+                chat_region = data.get("chat_region")
+                if chat_region and len(chat_region) == 4:
+                    left, top, right, bottom = [max(0.0, min(1.0, float(v))) for v in chat_region]
+                    if right > left and bottom > top:
+                        self.chat_region = (left, top, right, bottom)
+                self.frame_gate.threshold = max(0.0, float(data.get("frame_change_threshold", 0.002)))
+                self.frame_gate.pixel_delta = max(0, int(data.get("frame_change_pixel_delta", 16)))
+                self.verdict_cache.max_age = max(0.0, float(data.get("verdict_max_age", 1.5)))
+                self.color_prefilter.enabled = bool(data.get("color_prefilter", False))
+                self.color_prefilter.set_colors(data.get("embed_colors", []))
+                self.color_prefilter.tolerance = max(0, int(data.get("embed_color_tolerance", 24)))
+                self.color_prefilter.min_bar_height = max(4, int(data.get("embed_min_bar_height", 40)))
+                self.color_prefilter.embed_width = max(0.05, float(data.get("embed_width", 0.6)))
+                self.antibot_monitor.enabled = bool(data.get("antibot_monitor", True))
+                self.antibot_monitor.interval = max(0.2, float(data.get("monitor_interval", 1.0)))
+                self.ocr_engine.set_preferred(str(data.get("ocr_engine", "auto")))
+                psm = data.get("ocr_psm", 4)
+                self.ocr_engine.set_psm(int(psm) if psm is not None else None)
+                self.detection_pool.enabled = bool(data.get("ocr_process_pool", True))
+                self.detection_pool.workers = max(1, int(data.get("ocr_processes", 1)))
+                self.detection_pool.deadline = max(1.0, float(data.get("ocr_deadline", 10.0)))
+                self.detection_pool.preferred = self.ocr_engine.preferred
+                self.detection_pool.psm = self.ocr_engine.psm
+                self.ocr_preprocessor.enabled = bool(data.get("ocr_preprocess", True))
+                self.ocr_preprocessor.target_text_height = max(8, int(data.get("ocr_target_text_height", 24)))
+                self.ocr_preprocessor.threshold = max(0, min(255, int(data.get("ocr_threshold", 0))))
+                self.ocr_preprocessor.invert = bool(data.get("ocr_invert", True))
+                self.incremental_ocr.enabled = bool(data.get("ocr_incremental", True))
+                self.incremental_ocr.full_pass_interval = max(1, int(data.get("ocr_full_pass_interval", 30)))
+                self.tile_cache.enabled = bool(data.get("tile_cache", True))
+                self.tile_cache.max_entries = max(1, int(data.get("tile_cache_entries", 512)))
+                self.tile_cache.max_bytes = max(1024, int(data.get("tile_cache_bytes", 256 * 1024)))
+                self.fuzzy_matching = bool(data.get("antibot_fuzzy_matching", True))
+                extra_phrases = data.get("antibot_phrases", [])
+                max_edits = max(0, int(data.get("antibot_max_edits", 3)))
+                if extra_phrases or max_edits != ANTIBOT_MATCHER.max_edits:
+                    self.extra_antibot_phrases = [str(p) for p in extra_phrases]
+                    self.phrase_matcher = AntibotPhraseMatcher(
+                        DEFAULT_ANTIBOT_PHRASES + self.extra_antibot_phrases, max_edits=max_edits)
+                self.image_match_threshold = max(0.1, min(1.0, float(data.get("image_match_threshold", 0.80))))
+                self.template_dir = str(data.get("template_dir", self.template_dir))
+                self.hit_prior.enabled = bool(data.get("hit_prior", True))
+                self.hit_prior.radius = max(1, int(data.get("hit_prior_radius", 24)))
+                self.parallel_matcher.workers = max(1, int(data.get("matcher_workers", self.parallel_matcher.workers)))
+                self.template_process_pool = bool(data.get("template_process_pool", False))
+                mode = str(data.get("detection_mode", "auto"))
+                self.detection_mode = mode if mode in ("auto", "ocr", "image", "race") else "auto"
+                self.pyramid_depth = max(0, min(5, int(data.get("pyramid_depth", 2))))
+                self.pyramid_top_k = max(1, int(data.get("pyramid_top_k", 5)))
+                ocr_crop = data.get("ocr_crop")
+                if ocr_crop and len(ocr_crop) == 4:
+                    left, top, right, bottom = [max(0.0, min(1.0, float(v))) for v in ocr_crop]
+                    if right > left and bottom > top:
+                        self.ocr_preprocessor.crop = (left, top, right, bottom)
                 if "image_path" in data and os.path.exists(data["image_path"]):
                     self.image_path = data["image_path"]
                 if "lifetime_stats" in data:
@@ -1213,20 +3732,61 @@ class MacroGUI:
                 self.log(f"Failed to load settings: {e}", "warning")
 
     def save_settings(self):
+        # Called from the dispatcher after each send, so read the snapshot, not Tk
+        config = self.config_snapshot
         data = {
-            "owobuy_cooldown": self.owobuy_cooldown.get(),
-            "owo_cooldown": self.owo_cooldown.get(),
-            "owoh_owob_cooldown": self.owoh_owob_cooldown.get(),
-            "random_enabled": self.random_enabled.get(),
-            "owobuy_enabled": self.owobuy_enabled.get(),
-            "owo_enabled": self.owo_enabled.get(),
-            "use_slash_hunt_battle": self.use_slash_hunt_battle.get(),
-            "command_variance": self.command_variance.get(),
-            "typing_delay_min": self.typing_delay_min.get(),
-            "typing_delay_max": self.typing_delay_max.get(),
-            "typing_pause_min": self.typing_pause_min.get(),
-            "typing_pause_max": self.typing_pause_max.get(),
-            "window_name": self.window_name.get(),
+            "owobuy_cooldown": config.owobuy_cooldown,
+            "owo_cooldown": config.owo_cooldown,
+            "owoh_owob_cooldown": config.owoh_owob_cooldown,
+            "random_enabled": config.random_enabled,
+            "owobuy_enabled": config.owobuy_enabled,
+            "owo_enabled": config.owo_enabled,
+            "use_slash_hunt_battle": config.use_slash_hunt_battle,
+            "command_variance": config.command_variance,
+            "typing_delay_min": config.typing_delay_min,
+            "typing_delay_max": config.typing_delay_max,
+            "typing_pause_min": config.typing_pause_min,
+            "typing_pause_max": config.typing_pause_max,
+            "window_name": config.window_name,
+            "region_capture": self.region_capture,
+            "chat_region": list(self.chat_region) if self.chat_region else None,
+            "frame_change_threshold": self.frame_gate.threshold,
+            "frame_change_pixel_delta": self.frame_gate.pixel_delta,
+            "verdict_max_age": self.verdict_cache.max_age,
+            "color_prefilter": self.color_prefilter.enabled,
+            "embed_colors": [f"#{r:02x}{g:02x}{b:02x}" for r, g, b in self.color_prefilter.colors],
+            "embed_color_tolerance": self.color_prefilter.tolerance,
+            "embed_min_bar_height": self.color_prefilter.min_bar_height,
+            "embed_width": self.color_prefilter.embed_width,
+            "antibot_monitor": self.antibot_monitor.enabled,
+            "monitor_interval": self.antibot_monitor.interval,
+            "ocr_engine": self.ocr_engine.preferred,
+            "ocr_psm": self.ocr_engine.psm,
+            "ocr_process_pool": self.detection_pool.enabled,
+            "ocr_processes": self.detection_pool.workers,
+            "ocr_deadline": self.detection_pool.deadline,
+            "ocr_preprocess": self.ocr_preprocessor.enabled,
+            "ocr_target_text_height": self.ocr_preprocessor.target_text_height,
+            "ocr_threshold": self.ocr_preprocessor.threshold,
+            "ocr_invert": self.ocr_preprocessor.invert,
+            "ocr_crop": list(self.ocr_preprocessor.crop) if self.ocr_preprocessor.crop else None,
+            "ocr_incremental": self.incremental_ocr.enabled,
+            "ocr_full_pass_interval": self.incremental_ocr.full_pass_interval,
+            "tile_cache": self.tile_cache.enabled,
+            "tile_cache_entries": self.tile_cache.max_entries,
+            "tile_cache_bytes": self.tile_cache.max_bytes,
+            "antibot_phrases": self.extra_antibot_phrases,
+            "antibot_fuzzy_matching": self.fuzzy_matching,
+            "antibot_max_edits": self.phrase_matcher.max_edits,
+            "image_match_threshold": self.image_match_threshold,
+            "template_dir": self.template_dir,
+            "hit_prior": self.hit_prior.enabled,
+            "hit_prior_radius": self.hit_prior.radius,
+            "matcher_workers": self.parallel_matcher.workers,
+            "template_process_pool": self.template_process_pool,
+            "detection_mode": self.detection_mode,
+            "pyramid_depth": self.pyramid_depth,
+            "pyramid_top_k": self.pyramid_top_k,
             "image_path": self.image_path,
             "lifetime_stats": self.lifetime_stats
         }
@@ -1240,8 +3800,14 @@ class MacroGUI:
             self.log(f"Failed to save settings: {e}", "warning")
 
     def on_close(self):
-        self.running = False
-        self.stop_event.set()
+        self.signal_stop()
+        self.antibot_monitor.stop()
+        self.ocr_engine.close()
+        self.detection_pool.shutdown()
+        self.parallel_matcher.shutdown()
+        self.scheduler.input.close()
+        if self.race_executor is not None:
+            self.race_executor.shutdown(wait=False, cancel_futures=True)
         self.save_settings()
         self.root.destroy()
 